@@ -10,6 +10,19 @@ class _Action(abc.ABC):
     @abc.abstractmethod
     def run(self, dt, husky): pass
 
+    def get_time_to_done(self, dt, husky):
+        """
+        When run in steps of dt, the time from the start of this step to the end of the step in which the action is done,
+        at least; or None if it cannot be told without running it.
+        """
+        return None
+
+    def skip(self, steps, dt, husky):
+        """
+        Run the action for steps steps of dt, in none of which it is done.
+        """
+        for _ in range(steps): self.run(dt, husky)
+
 class _Rotate(_Action):
     def __init__(self, da):
         super(_Rotate, self).__init__()
@@ -32,6 +45,19 @@ class _Rotate(_Action):
 
         return elapsed
 
+    def get_time_to_done(self, dt, husky):
+        da = husky.rotational_speed * dt / 1000
+        if da == 0: return None
+
+        return max(math.ceil(abs(self.theta) / da), 1) * dt
+
+    def skip(self, steps, dt, husky):
+        # Angles are added once per step, as run does, so they round the same
+        da = math.copysign(husky.rotational_speed * dt / 1000, self.theta)
+        for _ in range(steps):
+            self.theta -= da
+            husky.pose.a += da
+
 class _Move(_Action):
     def __init__(self, dx, dy):
         super(_Move, self).__init__()
@@ -75,6 +101,38 @@ class _Move(_Action):
 
         return elapsed
 
+    def get_time_to_done(self, dt, husky):
+        dr = husky.linear_speed * dt
+        if dr == 0: return None
+
+        time = max(math.ceil(self.distance / dr), 1) * dt
+        if self._face_destination.done: return time
+
+        # The robot may start moving in the step in which it finishes turning
+        turn_time = self._face_destination.get_time_to_done(dt, husky)
+        return None if turn_time is None else turn_time + time - dt
+
+    def skip(self, steps, dt, husky):
+        while steps > 0 and not self._face_destination.done:
+            # The step in which the robot finishes turning, and the one before it in case of rounding, are run as usual
+            turn_steps = min(steps, self._face_destination.get_time_to_done(dt, husky) // dt - 2)
+            if turn_steps > 0: self._face_destination.skip(turn_steps, dt, husky)
+            else:
+                self.run(dt, husky)
+                turn_steps = 1
+
+            steps -= turn_steps
+
+        if steps <= 0: return
+
+        dr = husky.linear_speed * dt
+        rad = math.radians(husky.pose.a)
+
+        # The robot moves a whole number of mm each step, but the distance left is taken off once per step, as run does
+        husky.pose.x += int(dr * math.cos(rad)) * steps
+        husky.pose.y += int(dr * math.sin(rad)) * steps
+        for _ in range(steps): self.distance -= dr
+
 class _PickAction(_Action):
     def __init__(self, trash_id, volume):
         super(_PickAction, self).__init__()
@@ -82,6 +140,12 @@ class _PickAction(_Action):
         self.volume = volume
         self.countdown = 2000
 
+    def get_time_to_done(self, dt, husky):
+        return max(math.ceil(self.countdown / dt), 1) * dt
+
+    def skip(self, steps, dt, husky):
+        self.countdown -= steps * dt
+
     def run(self, dt, husky):
         elapsed = min(self.countdown, dt)
 
@@ -0,0 +1,213 @@
+import abc
+import collections
+import numpy
+import time
+
+# Cost of pairing a robot with a task it cannot reach or pick; such pairs are never assigned
+INFEASIBLE = 1e12
+
+# Added per task already on a robot's list, so work is spread across robots before it is stacked on one
+QUEUED_TASK_PENALTY = 1000
+
+def _get_start(robot, location_tracker):
+    # Task locations are in corridor coordinates, while the robot's pose is relative to the carrier
+    return robot.todo[-1].location if len(robot.todo) > 0 else location_tracker.to_absolute(robot.pose.location)
+
+class _GreedyAssignment:
+    """
+    In order along the corridor, give each task to the candidate robot that can reach it for the lowest score.
+    """
+    def assign(self, flow, location_tracker, candidate_robots_by_task, max_assignments):
+        pairs = []
+
+        for task in sorted(candidate_robots_by_task, key = lambda t: t.location.y):
+            available_robots = [robot for robot in candidate_robots_by_task[task] if len(robot.todo) < max_assignments]
+
+            min_score = 999999
+            closest_robot = None
+
+            for match in available_robots:
+                distance = flow.distance(_get_start(match, location_tracker), task.location)
+                if distance is None: continue
+
+                score = distance + QUEUED_TASK_PENALTY * len(match.todo)
+                if score < min_score:
+                    min_score = score
+                    closest_robot = match
+
+            if closest_robot is not None:
+                closest_robot.todo.append(task)
+                pairs.append((closest_robot, task))
+
+        return pairs
+
+class _MatrixAssignment(abc.ABC):
+    """
+    Solve the assignment of every candidate task to robot slots at once, over a cost matrix with one row per free slot
+    on each robot and one column per task. Slots on the same robot start where its last task leaves it, and each
+    further slot costs another QUEUED_TASK_PENALTY.
+    """
+    def assign(self, flow, location_tracker, candidate_robots_by_task, max_assignments):
+        robots = []
+        for candidates in candidate_robots_by_task.values():
+            for robot in candidates:
+                if robot not in robots and len(robot.todo) < max_assignments: robots.append(robot)
+
+        tasks = sorted(candidate_robots_by_task, key = lambda t: t.location.y)
+        if len(robots) == 0 or len(tasks) == 0: return []
+
+        slot_robots = []; slot_penalties = []
+        for robot in robots:
+            for k in range(len(robot.todo), max_assignments):
+                slot_robots.append(robot)
+                slot_penalties.append(QUEUED_TASK_PENALTY * k)
+
+        starts = [_get_start(robot, location_tracker) for robot in slot_robots]
+        goals = [task.location for task in tasks]
+
+        cost = flow.distance_matrix(starts, goals) + numpy.array(slot_penalties)[:, numpy.newaxis]
+
+        skills = numpy.array([[robot.end_effector in task.skills for task in tasks] for robot in robots])
+        skills_by_slot = skills[[robots.index(robot) for robot in slot_robots]]
+
+        cost[~skills_by_slot | ~numpy.isfinite(cost)] = INFEASIBLE
+
+        if cost.shape[0] <= cost.shape[1]:
+            columns_by_row = self._solve(cost)
+        else:
+            rows_by_column = self._solve(cost.T)
+            columns_by_row = numpy.full(cost.shape[0], -1)
+            for column, row in enumerate(rows_by_column):
+                if row >= 0: columns_by_row[row] = column
+
+        pairs = []
+        for row, column in enumerate(columns_by_row):
+            if column < 0 or cost[row, column] >= INFEASIBLE: continue
+
+            robot = slot_robots[row]; task = tasks[column]
+            robot.todo.append(task)
+            pairs.append((robot, task))
+
+        return pairs
+
+    @abc.abstractmethod
+    def _solve(self, cost):
+        """
+        Given a cost matrix with no more rows than columns, the column assigned to each row, or -1 if none.
+        """
+
+class _HungarianAssignment(_MatrixAssignment):
+    """
+    Optimal assignment by the Hungarian method with row and column potentials, O(rows^2 * columns).
+    """
+    def _solve(self, cost):
+        n, m = cost.shape
+
+        u = numpy.zeros(n + 1); v = numpy.zeros(m + 1)
+        row_by_column = numpy.zeros(m + 1, dtype = int)     # 1-indexed rows, 0 is unassigned
+        way = numpy.zeros(m + 1, dtype = int)
+
+        for i in range(1, n + 1):
+            row_by_column[0] = i
+            j0 = 0
+
+            min_reduced = numpy.full(m + 1, numpy.inf)
+            used = numpy.zeros(m + 1, dtype = bool)
+
+            while True:
+                used[j0] = True
+                i0 = row_by_column[j0]
+
+                free = ~used[1:]
+                reduced = cost[i0 - 1] - u[i0] - v[1:]
+
+                improved = free & (reduced < min_reduced[1:])
+                min_reduced[1:][improved] = reduced[improved]
+                way[1:][improved] = j0
+
+                candidates = numpy.where(free, min_reduced[1:], numpy.inf)
+                j1 = int(numpy.argmin(candidates)) + 1
+                delta = candidates[j1 - 1]
+
+                u[row_by_column[used]] += delta
+                v[used] -= delta
+                min_reduced[~used] -= delta
+
+                j0 = j1
+                if row_by_column[j0] == 0: break
+
+            while j0 != 0:
+                j1 = way[j0]
+                row_by_column[j0] = row_by_column[j1]
+                j0 = j1
+
+        columns_by_row = numpy.full(n, -1)
+        for j in range(1, m + 1):
+            if row_by_column[j] != 0: columns_by_row[row_by_column[j] - 1] = j - 1
+
+        return columns_by_row
+
+class _AuctionAssignment(_MatrixAssignment):
+    """
+    Forward auction with epsilon scaling. Near-optimal, and bounded in time: when the time limit runs out, the last
+    complete assignment found is used, or, if none completed, whatever has been won so far.
+    """
+    def __init__(self, time_limit_ms = 20, min_epsilon = 1):
+        self._time_limit = time_limit_ms / 1000
+        self._min_epsilon = min_epsilon
+
+    def _solve(self, cost):
+        deadline = time.perf_counter() + self._time_limit
+
+        # Pad with dummy rows that value every column at nothing, since the auction is only optimal when square
+        rows = cost.shape[0]
+        benefit = numpy.vstack((-cost, numpy.zeros((cost.shape[1] - rows, cost.shape[1]))))
+        n, m = benefit.shape
+
+        prices = numpy.zeros(m)
+        feasible = cost < INFEASIBLE
+        epsilon = max((cost[feasible].max() - cost[feasible].min()) / 4 if feasible.any() else 0, self._min_epsilon)
+
+        best = None
+
+        while True:
+            column_by_row = numpy.full(n, -1)
+            row_by_column = numpy.full(m, -1)
+            unassigned = collections.deque(range(n))
+
+            while len(unassigned) > 0:
+                if time.perf_counter() > deadline:
+                    return best if best is not None else column_by_row[:rows]
+
+                i = unassigned.popleft()
+
+                values = benefit[i] - prices
+                j = int(numpy.argmax(values))
+
+                if m > 1:
+                    first = values[j]
+                    values[j] = -numpy.inf
+                    second = values.max()
+                else:
+                    first = second = values[j]
+
+                prices[j] += first - second + epsilon
+
+                if row_by_column[j] >= 0:
+                    column_by_row[row_by_column[j]] = -1
+                    unassigned.append(row_by_column[j])
+
+                row_by_column[j] = i
+                column_by_row[i] = j
+
+            best = column_by_row[:rows]
+            if epsilon <= self._min_epsilon: return best
+
+            epsilon = max(epsilon / 4, self._min_epsilon)
+
+def create(name):
+    if name == "greedy": return _GreedyAssignment()
+    if name == "hungarian": return _HungarianAssignment()
+    if name == "auction": return _AuctionAssignment()
+
+    raise Exception(f"Assignment engine {name} not recognized.")
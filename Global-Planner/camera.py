@@ -1,3 +1,4 @@
+import collections
 import colors
 import math
 import pygame
@@ -10,8 +11,25 @@ import util
 # The image is scaled to be 66x99 pixels, so at 1.0x zoom, one pixel covers 10mm
 MM_PER_PIXEL = 10
 
+# Scaled and rotated sprites are cached with their angles rounded to this step, in degrees
+SPRITE_ANGLE_STEP_DEG = 2
+MAX_CACHED_SPRITES = 1024
+
+# Explored map cells are drawn once into tiles of about this many pixels square, redrawn when their block changes
+MAP_TILE_PIXELS = 256
+MAX_CACHED_MAP_TILES = 256
+
+# Rendered text, either whole labels or single glyphs of text that changes every frame
+MAX_CACHED_TEXTS = 512
+
+# Past this many changed regions in a frame, the display is updated in one region covering them all
+MAX_DIRTY_RECTS = 256
+
 class Camera:
-    def __init__(self, surface, events):
+    def __init__(self, surface, events, controls = ()):
+        """
+        The controls are help lines for the keys handled by the owner of the camera, listed above its own.
+        """
         self._surface = surface
 
         events.handle(pygame.MOUSEBUTTONDOWN, self._on_click)
@@ -28,6 +46,16 @@ class Camera:
 
         self._visible_world_rect = None
 
+        # Regions drawn this frame and last frame; only these have to be erased and updated on the display
+        self._surface.fill(colors.White)
+        self._dirty_rects = []
+        self._previous_dirty_rects = [self._surface.get_rect()]
+
+        self._sprites = collections.OrderedDict()
+        self._husky_images = {}
+        self._texts = collections.OrderedDict()
+        self._map_tiles = collections.OrderedDict()
+
         self._bus_image = pygame.image.load("bus.png")
         self._husky_image = pygame.image.load("husky.png")
 
@@ -49,10 +77,7 @@ class Camera:
         self._show_poses = False
         self._show_yolo = False
 
-        self._help_lines = [
-            "Simulation:",
-            "P - Toggle Pause",
-            "",
+        self._help_lines = list(controls) + ([""] if len(controls) > 0 else []) + [
             "Visualization:",
             "F - Toggle frame visibility",
             "L - Toggle LIDAR visibility",
@@ -93,8 +118,122 @@ class Camera:
         if event.key == pygame.K_w: self._show_poses = not self._show_poses
         if event.key == pygame.K_y: self._show_yolo = not self._show_yolo
 
+    # Caches
+    def _get_sprite(self, key, image, dimensions, angle):
+        """
+        The image scaled to the dimensions, unless they are None, and rotated to the angle rounded to the sprite angle
+        step. Sprites are cached by key, dimensions and angle, so each one is only transformed once.
+        """
+        angle = round(angle / SPRITE_ANGLE_STEP_DEG) * SPRITE_ANGLE_STEP_DEG % 360
+        sprite_key = (key, dimensions, angle)
+
+        try:
+            self._sprites.move_to_end(sprite_key)
+            return self._sprites[sprite_key]
+
+        except KeyError: pass
+
+        if dimensions is not None: image = pygame.transform.scale(image, dimensions)
+        if angle != 0: image = pygame.transform.rotate(image, angle)
+
+        self._sprites[sprite_key] = image
+        if len(self._sprites) > MAX_CACHED_SPRITES: self._sprites.popitem(last = False)
+
+        return image
+
+    def _get_husky_image(self, id, end_effector):
+        try: return self._husky_images[(id, end_effector)]
+        except KeyError: pass
+
+        husky_image = self._husky_image.copy()
+
+        # end_effector_image = self._end_effector_images[end_effector]
+        # husky_image.blit(end_effector_image, end_effector_image.get_rect(center = husky_image.get_rect().center))
+
+        husky_center = self._husky_image.get_rect().center
+
+        id_text = self._get_text(str(id), self._large_font, colors.WhiteSmoke, angle = -90)
+        husky_image.blit(id_text, id_text.get_rect(center = husky_center))
+
+        end_effector_text = self._get_text(end_effector[0:2], self._large_font, colors.WhiteSmoke, False, -90)
+        husky_image.blit(end_effector_text, end_effector_text.get_rect(center = (husky_center[0] - 20, husky_center[1])))
+
+        self._husky_images[(id, end_effector)] = husky_image
+        return husky_image
+
+    def _get_text(self, text, font, color, antialias = True, angle = 0):
+        """
+        The text rasterized in the font and color and rotated by the angle, cached so each label is only rendered once.
+        """
+        text_key = (text, font, color, antialias, angle)
+
+        try:
+            self._texts.move_to_end(text_key)
+            return self._texts[text_key]
+
+        except KeyError: pass
+
+        image = font.render(text, antialias, color)
+        if angle != 0: image = pygame.transform.rotate(image, angle)
+
+        self._texts[text_key] = image
+        if len(self._texts) > MAX_CACHED_TEXTS: self._texts.popitem(last = False)
+
+        return image
+
+    def _get_glyph_text(self, text, font, color, antialias = True):
+        """
+        The text put together from cached single glyphs, for text that changes too often to cache whole.
+        """
+        glyphs = [self._get_text(character, font, color, antialias) for character in text]
+
+        image = pygame.Surface((sum(glyph.get_width() for glyph in glyphs), font.get_height()), pygame.SRCALPHA)
+
+        x = 0
+        for glyph in glyphs:
+            image.blit(glyph, (x, 0))
+            x += glyph.get_width()
+
+        return image
+
+    def _get_map_tile(self, grid, tile_row, tile_col, cells_per_tile, cell_size):
+        """
+        A surface, keyed by black, outlining the known cells in a square of cells_per_tile cells. Tiles are cached until
+        the grid block holding them is revised.
+        """
+        first_row = tile_row * cells_per_tile
+        first_col = tile_col * cells_per_tile
+
+        revision = grid.get_revision(grid.get_block(first_row))
+        tile_key = (self._zoom, tile_row, tile_col)
+
+        try:
+            tile_revision, tile = self._map_tiles[tile_key]
+            self._map_tiles.move_to_end(tile_key)
+            if tile_revision == revision: return tile
+
+        except KeyError: pass
+
+        width, height = cell_size
+
+        tile = pygame.Surface((cells_per_tile * width, cells_per_tile * height))
+        tile.set_colorkey(colors.Black)
+
+        for row in range(first_row, first_row + cells_per_tile):
+            for col in range(first_col, min(first_col + cells_per_tile, grid.cols)):
+                if not grid.is_known(row, col): continue
+
+                # Rows count up the road, but the tile's pixel rows count down the screen
+                cell_rect = ((col - first_col) * width, (first_row + cells_per_tile - 1 - row) * height, width, height)
+                pygame.draw.rect(tile, colors.LightGray, cell_rect, 1)
+
+        self._map_tiles[tile_key] = (revision, tile)
+        if len(self._map_tiles) > MAX_CACHED_MAP_TILES: self._map_tiles.popitem(last = False)
+
+        return tile
+
     # Drawing
-    def _draw_entity(self, entity, image, draw_frame = False, pose_offset = (0, 0)):
+    def _draw_entity(self, entity, key, image, draw_frame = False, pose_offset = (0, 0)):
         footprint = pygame.Rect(
             0,
             0,
@@ -105,9 +244,7 @@ class Camera:
 
         if not self._visible_world_rect.colliderect(footprint): return
 
-        image = pygame.transform.scale(image, self._get_render_dimensions(entity.dimensions))
-        if entity.pose.a != 0:
-            image = pygame.transform.rotate(image, entity.pose.a)
+        image = self._get_sprite(key, image, self._get_render_dimensions(entity.dimensions), entity.pose.a)
 
         pose_render_position = self._get_render_position(entity.pose.location)
         image_render_position = self._get_render_position(
@@ -116,56 +253,98 @@ class Camera:
                 entity.pose.y + pose_offset[1]
             )
         )
-        self._surface.blit(image, image.get_rect(center = image_render_position))
+        self._dirty_rects.append(self._surface.blit(image, image.get_rect(center = image_render_position)))
 
         if draw_frame:
-            frame_image = self._frame_image
+            frame_image = self._get_sprite("frame", self._frame_image, None, entity.pose.a)
+            self._dirty_rects.append(self._surface.blit(frame_image, frame_image.get_rect(center = pose_render_position)))
+
+    def _get_visible_cells(self, origin, map):
+        """
+        The first and last rows and cols of the map's cells overlapping the visible world. The carrier only drives
+        straight up the road, so its frame is never rotated relative to the world.
+        """
+        first_row, first_col = map.get_containing_cell(
+            self._visible_world_rect.left - origin.x,
+            self._visible_world_rect.top - origin.y
+        )
+        last_row, last_col = map.get_containing_cell(
+            self._visible_world_rect.right - origin.x,
+            self._visible_world_rect.bottom - origin.y
+        )
+
+        return max(first_row, 0), last_row, max(first_col, 0), min(last_col, map.grid.cols - 1)
 
-            if entity.pose.a != 0:
-                frame_image = pygame.transform.rotate(self._frame_image, entity.pose.a)
+    def _draw_map(self, origin, map, first_row, last_row, first_col, last_col):
+        cell_size = self._get_render_dimensions((map.resolution, map.resolution))
+        width, height = cell_size
+        if width == 0 or height == 0: return
 
-            self._surface.blit(frame_image, frame_image.get_rect(center = pose_render_position))
+        # Tiles hold a power of two rows, so they never straddle two grid blocks
+        cells_per_tile = 2 ** int(math.log2(max(MAP_TILE_PIXELS // max(cell_size), 1)))
+        cells_per_tile = min(cells_per_tile, map.grid.block_rows)
+
+        for tile_row in range(first_row // cells_per_tile, last_row // cells_per_tile + 1):
+            if map.grid.get_revision(map.grid.get_block(tile_row * cells_per_tile)) == 0: continue
+
+            for tile_col in range(first_col // cells_per_tile, last_col // cells_per_tile + 1):
+                tile = self._get_map_tile(map.grid, tile_row, tile_col, cells_per_tile, cell_size)
+
+                # Place the tile by its bottom left cell, where that cell would be drawn on its own
+                first_cell_center = origin.get_absolute(
+                    map.get_center_location(tile_row * cells_per_tile, tile_col * cells_per_tile)
+                )
+                x, y = self._get_render_position(first_cell_center)
+                tile_rect = tile.get_rect(bottomleft = (x - width // 2, y - height // 2 + height))
+
+                self._dirty_rects.append(self._surface.blit(tile, tile_rect))
 
     def _draw_planner_info(self, origin, planner):
+        # Only what overlaps the visible world is drawn, found by the map rows and corridor y it covers
+        first_row, last_row, first_col, last_col = self._get_visible_cells(origin, planner.map)
+
+        first_absolute_y = self._visible_world_rect.top - origin.y + planner.tasks.location_tracker.offset
+        last_absolute_y = self._visible_world_rect.bottom - origin.y + planner.tasks.location_tracker.offset
+
         # Map
+        self._draw_map(origin, planner.map, first_row, last_row, first_col, last_col)
+
         cell_render_size = self._get_render_dimensions((planner.map.resolution, planner.map.resolution))
         cell_rect = pygame.Rect(0, 0, *cell_render_size)
 
-        for row, col in planner.map.grid:
-            center = origin.get_absolute(planner.map.get_center_location(row, col))
-            cell_rect.center = self._get_render_position(center)
-            pygame.draw.rect(self._surface, colors.LightGray, cell_rect, 1)
-
-            # text = self._small_font.render(f"({row}, {col})", True, colors.DarkGray)
-            # self._surface.blit(text, text.get_rect(center = cell_rect.center))
-
-        for row, col in planner.map.frontier:
+        for row, col in planner.map.frontier.in_rows(first_row, last_row):
             center = origin.get_absolute(planner.map.get_center_location(row, col))
             cell_rect.center = self._get_render_position(center)
-            pygame.draw.rect(self._surface, colors.Red, cell_rect, 1)
+            self._dirty_rects.append(pygame.draw.rect(self._surface, colors.Red, cell_rect, 1))
 
         # Tasks
-        for task in planner.tasks.retrieval_task_queue:
-            location_absolute = origin.get_absolute(task.location)
+        for task in planner.tasks.retrieval_task_queue.between(first_absolute_y, last_absolute_y):
+            location_absolute = origin.get_absolute(planner.tasks.location_tracker.to_relative(task.location))
             render_position = self._get_render_position(location_absolute)
-            pygame.draw.circle(self._surface, colors.LightGray, render_position, 10, 2)
+            self._dirty_rects.append(pygame.draw.circle(self._surface, colors.LightGray, render_position, 10, 2))
 
         # Lanes
         for low, high in planner.flow.lanes:
             render_low, _ = self._get_render_position(common.Location(low, 0))
             render_high, _ = self._get_render_position(common.Location(high, 0))
 
-            pygame.draw.line(self._surface, colors.Black, (render_low, self._surface.get_height()), (render_low, 0), 1)
-            pygame.draw.line(self._surface, colors.Black, (render_high, self._surface.get_height()), (render_high, 0), 1)
+            self._dirty_rects.append(pygame.draw.line(
+                self._surface, colors.Black, (render_low, self._surface.get_height()), (render_low, 0), 1
+            ))
+            self._dirty_rects.append(pygame.draw.line(
+                self._surface, colors.Black, (render_high, self._surface.get_height()), (render_high, 0), 1
+            ))
 
         # Robots
         for id, robot in planner.robots.items():
             for task in robot.todo:
                 if not isinstance(task, tasks.Retrieve): continue
 
-                location_absolute = origin.get_absolute(task.location)
+                location_absolute = origin.get_absolute(planner.tasks.location_tracker.to_relative(task.location))
+                if not self._visible_world_rect.collidepoint(location_absolute.x, location_absolute.y): continue
+
                 render_position = self._get_render_position(location_absolute)
-                pygame.draw.circle(self._surface, colors.Gold, render_position, 10, 2)
+                self._dirty_rects.append(pygame.draw.circle(self._surface, colors.Gold, render_position, 10, 2))
 
             # The planner's robot pose is relative to the carrier; transform back to global coordinates to draw
             robot_pose_absolute = origin.get_absolute(robot.pose)
@@ -174,7 +353,7 @@ class Camera:
             robot_render_position = self._get_render_position(robot_pose_absolute.location)
 
             if self._show_poses:
-                pygame.draw.circle(self._surface, colors.HotPink, robot_render_position, 3)
+                self._dirty_rects.append(pygame.draw.circle(self._surface, colors.HotPink, robot_render_position, 3))
 
             if self._show_tasks and len(robot.todo) > 0:
                 task = robot.todo[0]
@@ -184,10 +363,12 @@ class Camera:
                 elif isinstance(task, tasks.Retrieve): color = colors.DarkGoldenrod
                 elif isinstance(task, tasks.Explore): color = colors.LightSeaGreen
 
-                location_absolute = origin.get_absolute(task.location)
+                location_absolute = origin.get_absolute(planner.tasks.location_tracker.to_relative(task.location))
                 target_render_position = self._get_render_position(location_absolute)
 
-                pygame.draw.line(self._surface, color, robot_render_position, target_render_position, 1)
+                self._dirty_rects.append(
+                    pygame.draw.line(self._surface, color, robot_render_position, target_render_position, 1)
+                )
 
     # Rendering
     def _get_render_position(self, world_position):
@@ -208,7 +389,12 @@ class Camera:
         return render_dimensions
 
     def render(self, planner, carrier, huskies, litter, paused, run_time):
-        self._surface.fill(colors.White)
+        """
+        Redraw the scene, erasing only what was drawn last frame, and return the regions of the surface that changed so
+        only those have to be updated on the display.
+        """
+        for rect in self._previous_dirty_rects:
+            self._surface.fill(colors.White, rect)
 
         if self._visible_world_rect is None:
             surface_width, surface_height = self._surface.get_size()
@@ -227,7 +413,14 @@ class Camera:
             )
 
         # Litter
-        for id, trash in litter.items():
+        visible_litter = litter.in_rect(
+            self._visible_world_rect.left,
+            self._visible_world_rect.top,
+            self._visible_world_rect.right,
+            self._visible_world_rect.bottom
+        )
+
+        for trash in visible_litter:
             if not self._visible_world_rect.collidepoint((trash.pose.x, trash.pose.y)): continue
 
             render_position = self._get_render_position(trash.pose.location)
@@ -238,26 +431,12 @@ class Camera:
                     else colors.Orange if trash.type == "cig" \
                     else colors.Black
 
-            pygame.draw.circle(self._surface, color, render_position, radius)
+            self._dirty_rects.append(pygame.draw.circle(self._surface, color, render_position, radius))
 
         # Huskies
         for id, husky in huskies.items():
-            husky_image = self._husky_image.copy()
-
-            # end_effector_image = self._end_effector_images[husky.end_effector]
-            # husky_image.blit(end_effector_image, end_effector_image.get_rect(center = husky_image.get_rect().center))
-
-            husky_center = self._husky_image.get_rect().center
-
-            id_text = self._large_font.render(str(id), True, colors.WhiteSmoke)
-            id_text = pygame.transform.rotate(id_text, -90)
-            husky_image.blit(id_text, id_text.get_rect(center = husky_center))
-
-            end_effector_text = self._large_font.render(husky.end_effector[0:2], False, colors.WhiteSmoke)
-            end_effector_text = pygame.transform.rotate(end_effector_text, -90)
-            husky_image.blit(end_effector_text, end_effector_text.get_rect(center = (husky_center[0] - 20, husky_center[1])))
-
-            self._draw_entity(husky, husky_image, draw_frame = self._show_frames)
+            husky_image = self._get_husky_image(id, husky.end_effector)
+            self._draw_entity(husky, ("husky", id, husky.end_effector), husky_image, draw_frame = self._show_frames)
 
             husky_render_position = self._get_render_position(husky.pose.location)
 
@@ -276,7 +455,7 @@ class Camera:
 
                 lidar_arc_points.append(husky_render_position)
 
-                pygame.draw.polygon(self._surface, (112, 146, 190), lidar_arc_points, 2)
+                self._dirty_rects.append(pygame.draw.polygon(self._surface, (112, 146, 190), lidar_arc_points, 2))
 
             if self._show_yolo:
                 yolo_radius, _ = self._get_render_dimensions((husky.yolo_range, 0))
@@ -293,22 +472,40 @@ class Camera:
 
                 yolo_arc_points.append(husky_render_position)
 
-                pygame.draw.polygon(self._surface, (63, 72, 204), yolo_arc_points, 2)
+                self._dirty_rects.append(pygame.draw.polygon(self._surface, (63, 72, 204), yolo_arc_points, 2))
 
         # Carrier
-        self._draw_entity(carrier, self._bus_image, draw_frame = True, pose_offset = (-carrier.dimensions[0] / 2, 0))
+        self._draw_entity(
+            carrier,
+            "bus",
+            self._bus_image,
+            draw_frame = True,
+            pose_offset = (-carrier.dimensions[0] / 2, 0)
+        )
 
         self._draw_planner_info(carrier.pose, planner)
 
         if paused:
-            self._surface.blit(self._pause_image, self._pause_image.get_rect(topleft = (10, 10)))
+            self._dirty_rects.append(
+                self._surface.blit(self._pause_image, self._pause_image.get_rect(topleft = (10, 10)))
+            )
 
-        run_time_text = self._large_font.render(f"{run_time} ms", False, colors.DarkGray)
-        self._surface.blit(run_time_text, run_time_text.get_rect(right = self._surface.get_width() - 20))
+        run_time_text = self._get_glyph_text(f"{run_time} ms", self._large_font, colors.DarkGray, False)
+        self._dirty_rects.append(
+            self._surface.blit(run_time_text, run_time_text.get_rect(right = self._surface.get_width() - 20))
+        )
 
         # Help Text
         y = self._surface.get_height()
         for line in self._help_lines:
-            id_text = self._small_font.render(line, True, colors.Gray)
-            self._surface.blit(id_text, id_text.get_rect(bottomleft = (20, y - 20)))
-            y -= id_text.get_height()
\ No newline at end of file
+            id_text = self._get_text(line, self._small_font, colors.Gray)
+            self._dirty_rects.append(self._surface.blit(id_text, id_text.get_rect(bottomleft = (20, y - 20))))
+            y -= id_text.get_height()
+
+        # Changed Regions
+        changed_rects = self._previous_dirty_rects + self._dirty_rects
+        self._previous_dirty_rects = self._dirty_rects
+        self._dirty_rects = []
+
+        if len(changed_rects) > MAX_DIRTY_RECTS: return [changed_rects[0].unionall(changed_rects[1:])]
+        return changed_rects
\ No newline at end of file
@@ -0,0 +1,194 @@
+import numpy
+
+class ChunkedGrid:
+    """
+    Dense storage for the scores of explored cells, keyed by (row, col) like a dict.
+    Rows are grouped into fixed-size blocks, each holding an int8[block_rows, cols, 4] array of scores and a
+    bool[block_rows, cols] mask of which cells are known. Blocks are only allocated once a cell in them is known.
+    Each block also counts its revisions, bumped whenever cells in it are written, so readers can tell if it changed.
+    """
+    def __init__(self, cols, block_rows = 64):
+        self.cols = cols
+        self.block_rows = block_rows
+
+        self._scores_by_block = {}
+        self._known_by_block = {}
+        self._revision_by_block = {}
+        self._count = 0
+
+    def _get_block(self, block):
+        try: return self._scores_by_block[block], self._known_by_block[block]
+        except KeyError:
+            scores = numpy.zeros((self.block_rows, self.cols, 4), dtype = numpy.int8)
+            known = numpy.zeros((self.block_rows, self.cols), dtype = bool)
+
+            self._scores_by_block[block] = scores
+            self._known_by_block[block] = known
+            return scores, known
+
+    # Revisions
+    def get_block(self, row):
+        return row // self.block_rows
+
+    def get_revision(self, block):
+        return self._revision_by_block.get(block, 0)
+
+    def get_blocks(self):
+        return list(self._known_by_block)
+
+    def get_known(self, block):
+        """
+        The bool[block_rows, cols] mask of the known cells in an allocated block, to be read but not written.
+        """
+        return self._known_by_block[block]
+
+    def _bump_revision(self, block):
+        self._revision_by_block[block] = self._revision_by_block.get(block, 0) + 1
+
+    # Cells
+    def in_bounds(self, row, col):
+        return row >= 0 and 0 <= col < self.cols
+
+    def is_known(self, row, col):
+        if not self.in_bounds(row, col): return False
+
+        block, local_row = divmod(row, self.block_rows)
+        try: return bool(self._known_by_block[block][local_row, col])
+        except KeyError: return False
+
+    def get_scores(self, row, col):
+        block, local_row = divmod(row, self.block_rows)
+        return tuple(self._scores_by_block[block][local_row, col].tolist())
+
+    def set_scores(self, row, col, scores):
+        if not self.in_bounds(row, col):
+            raise IndexError(f"Cell {(row, col)} is outside of the grid.")
+
+        block, local_row = divmod(row, self.block_rows)
+        block_scores, block_known = self._get_block(block)
+
+        if not block_known[local_row, col]:
+            block_known[local_row, col] = True
+            self._count += 1
+
+        block_scores[local_row, col] = scores
+        self._bump_revision(block)
+
+    def get_window(self, first_row, last_row):
+        """
+        Copies of the scores and known mask of every cell in rows first_row to last_row inclusive, as arrays of shape
+        (rows, cols, 4) and (rows, cols). Rows outside the grid are unknown.
+        """
+        rows = last_row - first_row + 1
+        scores = numpy.zeros((rows, self.cols, 4), dtype = numpy.int8)
+        known = numpy.zeros((rows, self.cols), dtype = bool)
+
+        current_row = max(first_row, 0)
+        while current_row <= last_row:
+            block, local_row = divmod(current_row, self.block_rows)
+            n = min(self.block_rows - local_row, last_row - current_row + 1)
+
+            if block in self._known_by_block:
+                window = slice(current_row - first_row, current_row - first_row + n)
+                scores[window] = self._scores_by_block[block][local_row:local_row + n]
+                known[window] = self._known_by_block[block][local_row:local_row + n]
+
+            current_row += n
+
+        return scores, known
+
+    def merge(self, row, col, scores):
+        """
+        Copy a window of scores, whose first cell is (row, col), into every cell of the grid not already known.
+        Returns the rows and cols of the newly known cells.
+        """
+        height, width = scores.shape[:2]
+
+        first_row = max(row, 0); last_row = row + height
+        first_col = max(col, 0); last_col = min(col + width, self.cols)
+
+        new_rows = []; new_cols = []
+
+        current_row = first_row
+        while current_row < last_row and first_col < last_col:
+            block, local_row = divmod(current_row, self.block_rows)
+            n = min(self.block_rows - local_row, last_row - current_row)
+
+            block_scores, block_known = self._get_block(block)
+            window = (slice(local_row, local_row + n), slice(first_col, last_col))
+
+            unknown = ~block_known[window]
+            source = scores[current_row - row:current_row - row + n, first_col - col:last_col - col]
+
+            block_scores[window][unknown] = source[unknown]
+            block_known[window] = True
+
+            local_rows, local_cols = numpy.nonzero(unknown)
+            new_rows.append(local_rows + current_row)
+            new_cols.append(local_cols + first_col)
+            self._count += len(local_rows)
+            if len(local_rows) > 0: self._bump_revision(block)
+
+            current_row += n
+
+        if len(new_rows) == 0: return numpy.empty(0, dtype = int), numpy.empty(0, dtype = int)
+        return numpy.concatenate(new_rows), numpy.concatenate(new_cols)
+
+    # Dict Interface
+    def __contains__(self, cell): return self.is_known(*cell)
+    def __getitem__(self, cell):
+        if not self.is_known(*cell): raise KeyError(cell)
+        return self.get_scores(*cell)
+
+    def __setitem__(self, cell, scores): self.set_scores(*cell, scores)
+    def __len__(self): return self._count
+    def __iter__(self):
+        for cell, _ in self.items(): yield cell
+
+    def items(self):
+        for block in sorted(self._known_by_block):
+            known = self._known_by_block[block]
+            scores = self._scores_by_block[block]
+            first_row = block * self.block_rows
+
+            for local_row, col in zip(*numpy.nonzero(known)):
+                yield (first_row + int(local_row), int(col)), tuple(scores[local_row, col].tolist())
+
+    # Memory
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self._scores_by_block.values()) + sum(a.nbytes for a in self._known_by_block.values())
+
+class NewCellTracker:
+    """
+    Finds the cells of a grid that became known since the last poll, by comparing the known masks of the blocks revised
+    since then with copies kept from that poll.
+    """
+    def __init__(self, grid):
+        self.grid = grid
+
+        self._known_by_block = {}
+        self._revision_by_block = {}
+
+    def poll(self):
+        """
+        The rows and cols of the cells known since the last poll, or since the tracker was created for the first poll.
+        """
+        new_rows = []; new_cols = []
+
+        for block in self.grid.get_blocks():
+            revision = self.grid.get_revision(block)
+            if self._revision_by_block.get(block) == revision: continue
+
+            known = self.grid.get_known(block)
+            previously_known = self._known_by_block.get(block)
+
+            local_rows, cols = numpy.nonzero(known if previously_known is None else known & ~previously_known)
+            new_rows.append(local_rows + block * self.grid.block_rows)
+            new_cols.append(cols)
+
+            self._known_by_block[block] = known.copy()
+            self._revision_by_block[block] = revision
+
+        if len(new_rows) == 0: return numpy.empty(0, dtype = int), numpy.empty(0, dtype = int)
+        return numpy.concatenate(new_rows), numpy.concatenate(new_cols)
@@ -50,6 +50,19 @@ class Pose:
     def __str__(self): return f"Pose({self.x}, {self.y}, {self.a})"
     def __repr__(self): return f"Pose({self.x}, {self.y}, {self.a})"
 
+class Patch:
+    """
+    A dense window of cell scores, as an array of shape (rows, cols, 4), whose first cell is offset (row, col)
+    cells from the cell containing the pose that observed it.
+    """
+    def __init__(self, row, col, scores):
+        self.row = row
+        self.col = col
+        self.scores = scores
+
+    def __str__(self): return f"Patch({self.row}, {self.col}, {self.scores.shape[0]}x{self.scores.shape[1]})"
+    def __repr__(self): return f"Patch({self.row}, {self.col}, {self.scores.shape[0]}x{self.scores.shape[1]})"
+
 class Location:
     def __init__(self, x, y):
         self.x = int(x)
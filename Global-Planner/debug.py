@@ -1,32 +1,155 @@
+import atexit
+import collections
+import functools
+import json
+import math
 import time
 
-_on = True
+# Logging
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+_names_by_level = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+_level = DEBUG
+suppressed_by_level = collections.Counter()
+
+def set_level(level):
+    global _level
+    _level = level
 
 def on():
-    global _on
-    _on = True
+    set_level(DEBUG)
 
 def off():
-    global _on
-    _on = False
+    """
+    Silence debug and info messages; warnings and errors are still printed.
+    """
+    set_level(WARNING)
+
+def log(message, *args, level = DEBUG):
+    """
+    Print the message if its level is enabled, otherwise only count it. Formatting is deferred until the message is
+    printed: the message is either a %-style format string for args, or a callable returning the message.
+    """
+    if level < _level:
+        suppressed_by_level[level] += 1
+        return
+
+    if callable(message): message = message()
+    elif len(args) > 0: message = message % args
+
+    print(f"[{_names_by_level[level]}]: {message}")
+
+def error(message, *args):
+    log(message, *args, level = ERROR)
+
+# Profiling
+# Latencies are counted in geometric buckets, from 1 us growing by 10% each, which bounds percentile error to 10%
+_BUCKET_BASE = 1e-6
+_BUCKET_GROWTH = 1.1
+
+class _Profile:
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.counts_by_bucket = collections.Counter()
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+        bucket = int(math.log(seconds / _BUCKET_BASE, _BUCKET_GROWTH)) if seconds > _BUCKET_BASE else 0
+        self.counts_by_bucket[bucket] += 1
+
+    def percentile(self, p):
+        """
+        The upper bound of the bucket holding the p-th percentile latency, in seconds.
+        """
+        threshold = p / 100 * self.count
+        seen = 0
+
+        for bucket in sorted(self.counts_by_bucket):
+            seen += self.counts_by_bucket[bucket]
+            if seen >= threshold: return min(_BUCKET_BASE * _BUCKET_GROWTH ** (bucket + 1), self.max)
+
+        return self.max
 
-def log(message):
-    if _on: print(f"[DEBUG]: {message}")
+_profiling = False
+_profiles = collections.defaultdict(_Profile)
+
+_trace_filename = None
+_trace_events = collections.deque()
+
+def start_profiling(trace_filename = None, max_trace_events = 1000000):
+    """
+    Aggregate the latencies of every profiled function, reporting them at exit. If a trace filename is given, also keep
+    the last max_trace_events calls and save them at exit as a Chrome trace, viewable in chrome://tracing.
+    """
+    global _profiling, _trace_filename, _trace_events
+    _profiling = True
+
+    _trace_filename = trace_filename
+    _trace_events = collections.deque(maxlen = max_trace_events)
+
+def stop_profiling():
+    global _profiling
+    _profiling = False
 
 def profiled(fn):
+    name = fn.__qualname__
+
+    @functools.wraps(fn)
     def wrapper(*args, **kwargs):
+        if not _profiling: return fn(*args, **kwargs)
+
         start = time.perf_counter()
         out = fn(*args, **kwargs)
+        end = time.perf_counter()
 
-        ms = (time.perf_counter() - start) * 1000
-        if _on: print(f"{fn} took {ms} ms")
+        _profiles[name].add(end - start)
+        if _trace_filename is not None: _trace_events.append((name, start, end))
 
         return out
 
     return wrapper
 
+def report():
+    if len(suppressed_by_level) > 0:
+        counts = ", ".join(f"{count} {_names_by_level[level]}" for level, count in sorted(suppressed_by_level.items()))
+        print(f"Suppressed log messages: {counts}")
+
+    if len(_profiles) == 0: return
+
+    print(f"{'Function':<40}{'Calls':>10}{'Total ms':>12}{'Mean ms':>10}{'p95 ms':>10}{'Max ms':>10}")
+    for name, profile in sorted(_profiles.items(), key = lambda item: -item[1].total):
+        print(
+            f"{name:<40}{profile.count:>10}{profile.total * 1000:>12.1f}{profile.total / profile.count * 1000:>10.3f}"
+            f"{profile.percentile(95) * 1000:>10.3f}{profile.max * 1000:>10.3f}"
+        )
+
+def save_trace(filename):
+    events = [
+        {"name": name, "ph": "X", "ts": start * 1e6, "dur": (end - start) * 1e6, "pid": 0, "tid": 0}
+        for name, start, end in _trace_events
+    ]
+
+    with open(filename, "w+") as file:
+        json.dump({"traceEvents": events}, file)
+
+@atexit.register
+def _on_exit():
+    if not _profiling: return
+
+    report()
+    if _trace_filename is not None: save_trace(_trace_filename)
+
 def conditional(fn):
     def wrapper(*args, **kwargs):
-        if _on: return fn(*args, **kwargs)
+        if _level <= DEBUG: return fn(*args, **kwargs)
 
     return wrapper
@@ -24,6 +24,15 @@ class Carrier(Entity):
         self.pose.y += dy
         self._dy += dy
 
+    def skip(self, steps, dt):
+        """
+        Move for steps steps of dt, adding each step's distance as move does so positions round the same.
+        """
+        dy = self._speed * dt
+        for _ in range(steps):
+            self.pose.y += dy
+            self._dy += dy
+
     # Monitor
     def get_monitor_data(self):
         data = (self._dy, self._speed)
@@ -63,6 +72,40 @@ class Husky(Entity):
         for command in commands:
             self.actions.append(actions.create(command))
 
+    def get_time_to_next_event(self, dt, limit):
+        """
+        When updated in steps of dt, the time from the start of this step to the end of the step in which the husky next
+        finishes a pick, at least, counted no further than limit; or None if it has no pick to finish. Picks are the only
+        actions the simulation must see finish, so moves and turns before them are counted through.
+        """
+        time = 0
+        for i, action in enumerate(self.actions):
+            action_time = action.get_time_to_done(dt, self)
+            if action_time is None: return time
+
+            # Each action after the first may start part way through the step in which the one before it is done
+            time += action_time if i == 0 else action_time - dt
+            if isinstance(action, actions._PickAction) or time >= limit: return time
+
+        return None
+
+    def skip(self, steps, dt):
+        """
+        Update the husky for steps steps of dt in which it finishes no pick, the same as calling update once per step.
+        """
+        while steps > 0 and len(self.actions) > 0:
+            time = self.actions[0].get_time_to_done(dt, self)
+
+            # The step in which the action is done is updated as usual, and so is the one before it in case the time to
+            # done, found in one go, rounds differently from the step by step updates
+            quiet_steps = 0 if time is None else min(steps, time // dt - 2)
+            if quiet_steps > 0: self.actions[0].skip(quiet_steps, dt, self)
+            else:
+                self.update(dt)
+                quiet_steps = 1
+
+            steps -= quiet_steps
+
     def update(self, dt):
         if len(self.actions) == 0: return
 
@@ -82,28 +125,22 @@ class Husky(Entity):
         pose_row = int(self.pose.y / grid.resolution)
         pose_col = int(self.pose.x / grid.resolution)
 
-        partial_grid = {}
-        for r in range(-hops, hops + 1):
-            for c in range(-hops, hops + 1):
-                access_row = r + pose_row
-                access_col = c + pose_col
-
-                if not (0 <= access_row < grid.rows): continue
-                if not (0 <= access_col < grid.cols): continue
+        first_row = max(pose_row - hops, 0); last_row = min(pose_row + hops + 1, grid.rows)
+        first_col = max(pose_col - hops, 0); last_col = min(pose_col + hops + 1, grid.cols)
 
-                scores = grid.costs[access_row][access_col]
-                partial_grid[(r, c)] = scores
-
-        return partial_grid
+        return common.Patch(
+            first_row - pose_row,
+            first_col - pose_col,
+            grid.costs[first_row:max(first_row, last_row), first_col:max(first_col, last_col)]
+        )
 
     # Classifier
     @debug.profiled
     def get_visible_litter(self, litter):
-        robot_bucket = (self.pose.x // 1000, self.pose.y // 1000)
-        hops = self.yolo_range // 1000
-
         visible_litter = []
-        for tid, trash in litter.items():
+        for trash in litter.in_sector(self.pose, self.yolo_range, self.pose.a, self.yolo_arc):
+            tid = trash.id
+
             if self.pose.distance(trash.pose.location) < self.yolo_range:
                 pose_relative_to_robot = trash.pose.relative_to(self.pose)
 
@@ -0,0 +1,22 @@
+import pygame
+
+class EventPump:
+    """
+    Dispatches pygame events to the handlers registered for their types. Only the owner may pump the events.
+    """
+    def __init__(self, owner):
+        self._owner_id = id(owner)
+        self._handlers = {}
+
+    def handle(self, event, handler):
+        try: self._handlers[event].append(handler)
+        except KeyError: self._handlers[event] = [handler]
+
+    def process(self, caller):
+        if id(caller) != self._owner_id:
+            raise Exception(f"Caller {caller} is not authorized to call {self.process}")
+
+        for event in pygame.event.get():
+            if event.type in self._handlers:
+                for handler in self._handlers[event.type]:
+                    handler(event)
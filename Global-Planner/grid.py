@@ -1,9 +1,9 @@
 import common
 import math
-import random
+import numpy
 
 class Grid:
-    def __init__(self, width, height, resolution):
+    def __init__(self, width, height, resolution, rng):
         self.width = width; self.height = height    # mm
         self.resolution = resolution                # mm
 
@@ -11,7 +11,10 @@ class Grid:
         self.cols = math.ceil(width / resolution)
 
         # TODO: Get these from file or something
-        self.costs = [[tuple(random.randint(0, 5) for _ in range(4)) for _ in range(self.cols)] for _ in range(self.rows)]
+        self.costs = numpy.array(
+            [[[rng.randint(0, 5) for _ in range(4)] for _ in range(self.cols)] for _ in range(self.rows)],
+            dtype = numpy.int8
+        )
 
     def get_center(self, row, col):
         return common.Location(
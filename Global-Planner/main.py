@@ -1,12 +1,28 @@
+import argparse
 import debug
 import wuc
 import simulation
 
 if __name__ == '__main__':
-    debug.on()
+    parser = argparse.ArgumentParser(description = "Global Planner Simulator")
+    parser.add_argument("--config", default = "config.json")
+    parser.add_argument("--headless", action = "store_true", help = "run without a window as fast as possible, then print metrics")
+    parser.add_argument("--profile", action = "store_true", help = "report latencies of profiled functions at exit")
+    parser.add_argument("--trace", help = "with --profile, also save a Chrome trace of profiled calls to this file")
+    parser.add_argument("--record", help = "save a binary trace of the run to this file, to replay with player.py")
+    args = parser.parse_args()
 
-    planner = wuc.WorkerUnitCoordinator()
+    # Per-call debug output would dominate a headless run
+    if args.headless: debug.off()
+    else: debug.on()
 
-    wrapper = simulation.Simulation("config.json")
+    if args.profile: debug.start_profiling(args.trace)
+
+    wrapper = simulation.Simulation(args.config, headless = args.headless, trace_filename = args.record)
     # wrapper = ros.RosWrapper(planner)
-    wrapper.run(planner)
+
+    planner = wuc.WorkerUnitCoordinator(seed = wrapper.seed)
+    summary = wrapper.run(planner)
+
+    for name, value in summary.items():
+        print(f"{name}: {value}")
@@ -1,25 +1,148 @@
 import debug
+import math
+import os
 
+class _CsvStream:
+    """
+    Rows buffered in memory and appended to a ';' separated file every chunk_rows rows, so memory stays constant and
+    a run that dies loses at most one chunk.
+    """
+    def __init__(self, filename, chunk_rows):
+        self._file = open(filename, "w+")
+        self._chunk_rows = chunk_rows
+        self._rows = []
+
+    def write(self, *fields):
+        self._rows.append(";".join(str(field) for field in fields) + "\n")
+        if len(self._rows) >= self._chunk_rows: self.flush()
+
+    def flush(self):
+        self._file.write("".join(self._rows))
+        self._file.flush()
+        self._rows.clear()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+_discoveries = None
+_waits = None
+_collected = None
+
+# Discovery times of the litter seen but not yet picked, by trash id
 discovery_time_by_id = {}
-pick_time_by_id = {}
-collected_trash_by_time = []
-visits_by_cell = {}
 
-def save():
+_downsample_ms = 0
+_last_collected_time = None
+
+# The latest collected trash count left out by downsampling, written when the metrics are finished
+_unwritten_collected = None
+
+_discovered_count = 0
+_collected_count = 0
+_total_wait_time = 0
+_max_wait_time = 0
+
+def start(directory = "data", chunk_rows = 256, downsample_ms = 0):
+    """
+    Open the metric files in the directory, replacing any from an earlier run. Collected trash counts are recorded at
+    most once every downsample_ms.
+    """
+    global _discoveries, _waits, _collected, _downsample_ms, _last_collected_time, _unwritten_collected
+    global _discovered_count, _collected_count, _total_wait_time, _max_wait_time
+
+    finish()
+    os.makedirs(directory, exist_ok = True)
+
+    _discoveries = _CsvStream(os.path.join(directory, "discovery_times.csv"), chunk_rows)
+    _waits = _CsvStream(os.path.join(directory, "wait_times.csv"), chunk_rows)
+    _collected = _CsvStream(os.path.join(directory, "collected_trash.csv"), chunk_rows)
+
+    discovery_time_by_id.clear()
+
+    _downsample_ms = downsample_ms
+    _last_collected_time = None
+    _unwritten_collected = None
+
+    _discovered_count = 0
+    _collected_count = 0
+    _total_wait_time = 0
+    _max_wait_time = 0
+
+def finish():
+    global _discoveries, _waits, _collected, _unwritten_collected
+
+    if _discoveries is None: return
     debug.log("Saving metrics")
 
-    with open("data/discovery_times.csv", "w+") as file:
-        for id, data in discovery_time_by_id.items():
-            type, location, discovery_time = data
-            file.write(f"{id};{type};{location};{discovery_time}\n")
-
-    with open("data/wait_times.csv", "w+") as file:
-        for id, data in pick_time_by_id.items():
-            type, location, pick_time = data
-            discovery_time = discovery_time_by_id[id][2]
-            wait_time = pick_time - discovery_time
-            file.write(f"{id};{type};{location};{wait_time}\n")
-
-    with open("data/collected_trash.csv", "w+") as file:
-        for time, n in collected_trash_by_time:
-            file.write(f"{time};{n}\n")
+    if _unwritten_collected is not None: _collected.write(*_unwritten_collected)
+    _unwritten_collected = None
+
+    for stream in (_discoveries, _waits, _collected): stream.close()
+    _discoveries = _waits = _collected = None
+
+# Record
+def record_discovery(id, type, location, discovery_time):
+    """
+    Record the first time the trash is seen; later sightings are ignored.
+    """
+    global _discovered_count
+
+    if id in discovery_time_by_id: return
+    discovery_time_by_id[id] = discovery_time
+
+    _discoveries.write(id, type, location, discovery_time)
+    _discovered_count += 1
+
+def record_pick(id, type, location, pick_time):
+    global _collected_count, _total_wait_time, _max_wait_time
+
+    wait_time = pick_time - discovery_time_by_id.pop(id)
+    _waits.write(id, type, location, wait_time)
+
+    _collected_count += 1
+    _total_wait_time += wait_time
+    _max_wait_time = max(_max_wait_time, wait_time)
+
+def record_collected(time, n):
+    global _last_collected_time, _unwritten_collected
+
+    if _last_collected_time is not None and time - _last_collected_time < _downsample_ms:
+        _unwritten_collected = (time, n)
+        return
+
+    _collected.write(time, n)
+    _last_collected_time = time
+    _unwritten_collected = None
+
+def record_steady_collected(first_time, steps, dt, n):
+    """
+    Record an unchanged collected trash count for steps steps of dt from first_time, the same as calling
+    record_collected once per step, but visiting only the steps not left out by downsampling.
+    """
+    global _unwritten_collected
+
+    last_time = first_time + (steps - 1) * dt
+    time = first_time
+
+    while time <= last_time:
+        if _last_collected_time is not None and time - _last_collected_time < _downsample_ms:
+            # Go straight to the first step due to be written
+            time += math.ceil((_last_collected_time + _downsample_ms - time) / dt) * dt
+            continue
+
+        record_collected(time, n)
+        time += dt
+
+    if _last_collected_time != last_time: _unwritten_collected = (last_time, n)
+
+# Summary
+def summarize(run_time):
+    return {
+        "run_time_ms": run_time,
+        "discovered": _discovered_count,
+        "collected": _collected_count,
+        "collected_per_minute": 60000 * _collected_count / run_time if run_time > 0 else 0,
+        "mean_wait_ms": _total_wait_time / _collected_count if _collected_count > 0 else 0,
+        "max_wait_ms": _max_wait_time
+    }
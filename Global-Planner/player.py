@@ -0,0 +1,220 @@
+import argparse
+import bisect
+import camera
+import common
+import entities
+import events
+import pygame
+import recording
+import spatial
+import tasks
+import time
+import wuc
+
+class Replay:
+    """
+    The state of a recorded run at one of its frames, shaped like the simulation's entities and the planner that the
+    camera draws. Moving forward applies the frames in between; moving back starts over from the first frame.
+    """
+    def __init__(self, trace):
+        self.trace = trace
+        self.index = -1
+
+        self.carrier = entities.Carrier(0)
+
+        self.huskies = {}
+        for spec in trace.header["huskies"]:
+            self.huskies[spec["id"]] = entities.Husky(
+                1,
+                1,
+                spec["lidar_range"],
+                spec["lidar_arc"],
+                spec["yolo_range"],
+                spec["yolo_arc"],
+                0,
+                0,
+                spec["end_effector"]
+            )
+
+        self._reset()
+
+    def _reset(self):
+        self.index = -1
+
+        # Planner
+        self.map = wuc.Map()
+        self.flow = wuc.PathPlanner(self.map, lane_count = self.trace.header["lane_count"])
+        self.tasks = wuc.CarrierQueue(self.map, self.flow)
+        self.robots = {}
+
+        self.litter = spatial.SpatialHash(self.map.resolution)
+        for id, type, x, y in self.trace.header["litter"]:
+            trash = entities.Trash(id, type, 0, 1, [])
+            trash.pose.x = x
+            trash.pose.y = y
+
+            self.litter[id] = trash
+
+    def seek(self, index):
+        if index == self.index: return
+        if index < self.index: self._reset()
+
+        for i in range(self.index + 1, index + 1):
+            frame = self.trace[i]
+
+            for id in frame.removed_litter_ids.tolist():
+                if id in self.litter: del self.litter[id]
+
+            for row, col in frame.new_cells.tolist():
+                self.map.grid.set_scores(row, col, (0, 0, 0, 0))
+
+        self.index = index
+        self._load_snapshot(self.trace[index])
+
+    def _load_snapshot(self, frame):
+        """
+        Replace everything recorded whole in each frame with the frame's copy.
+        """
+        self.carrier.pose.x = frame.carrier_x
+        self.carrier.pose.y = frame.carrier_y
+
+        for id, x, y, a in frame.huskies.tolist():
+            pose = self.huskies[id].pose
+            pose.x = x; pose.y = y; pose.a = a
+
+        # The map and queued tasks are kept relative to the carrier by the planner's offset along the corridor
+        self.map.notify_movement(frame.offset - self.tasks.location_tracker.offset)
+        self.tasks.location_tracker.update(frame.offset - self.tasks.location_tracker.offset)
+
+        self.map.frontier = wuc.Frontier()
+        for cell in frame.frontier.tolist():
+            self.map.frontier.add(tuple(cell))
+
+        self.tasks.retrieval_task_queue = wuc.RetrievalTaskIndex(self.flow)
+        for x, absolute_y in frame.queued_tasks.tolist():
+            self.tasks.retrieval_task_queue.add(tasks.Retrieve(None, common.Location(x, absolute_y), None, 0, []))
+
+        self.robots = {}
+        todo = iter(frame.todo.tolist())
+
+        for id, x, y, a, todo_count in frame.robots.tolist():
+            robot = wuc.Robot(common.Pose(x, y, a))
+
+            for _ in range(todo_count):
+                kind, task_x, task_absolute_y = next(todo)
+                robot.todo.append(_create_task(kind, common.Location(task_x, task_absolute_y)))
+
+            self.robots[id] = robot
+
+    @property
+    def time(self): return self.trace.times[self.index]
+
+def _create_task(kind, location):
+    if kind == recording.RETRIEVE: return tasks.Retrieve(None, location, None, 0, [])
+    if kind == recording.EXPLORE: return tasks.Explore(location)
+
+    task = tasks.Service(0, 0)
+    task.location = location
+    return task
+
+class Player:
+    def __init__(self, filename, speed = 1):
+        trace = recording.Trace(filename)
+
+        # A run that died before its first frame was written leaves nothing to show
+        if len(trace) == 0:
+            print(f"{filename} has no frames to replay.")
+            quit(1)
+
+        pygame.init()
+
+        self._replay = Replay(trace)
+        self._replay.seek(0)
+
+        self._time = 0
+        self._speed = speed
+        self._paused = False
+
+        self._events = events.EventPump(self)
+        self._events.handle(pygame.QUIT, self._on_quit)
+        self._events.handle(pygame.KEYDOWN, self._on_keydown)
+
+        surface = pygame.display.set_mode((700, 1000))
+        self._camera = camera.Camera(
+            surface,
+            self._events,
+            controls = [
+                "Replay:",
+                "P - Toggle Pause",
+                "Left/Right - Seek 5 s",
+                "Down/Up - Halve/double speed",
+                "0-9 - Seek to 0-90%",
+            ]
+        )
+
+        self._update_caption()
+
+    # Event Handlers
+    def _on_quit(self, _):
+        pygame.quit()
+        quit(0)
+
+    def _on_keydown(self, event):
+        if event.key in (pygame.K_p, pygame.K_SPACE): self._paused = not self._paused
+
+        if event.key == pygame.K_LEFT: self._seek(self._time - 5000)
+        if event.key == pygame.K_RIGHT: self._seek(self._time + 5000)
+
+        if event.key == pygame.K_DOWN: self._speed /= 2
+        if event.key == pygame.K_UP: self._speed *= 2
+
+        if pygame.K_0 <= event.key <= pygame.K_9:
+            self._seek((event.key - pygame.K_0) / 10 * self._replay.trace.times[-1])
+
+        self._update_caption()
+
+    # Playback
+    def _seek(self, time):
+        times = self._replay.trace.times
+        self._time = min(max(time, times[0]), times[-1])
+
+        # Show the last frame recorded at or before the time
+        self._replay.seek(max(bisect.bisect_right(times, self._time) - 1, 0))
+
+    def _update_caption(self):
+        pygame.display.set_caption(f"Global Planner Replay - {self._speed:g}x{' (paused)' if self._paused else ''}")
+
+    def run(self):
+        frame_countdown = 0
+        prev = time.perf_counter()
+
+        while True:
+            self._events.process(self)
+
+            now = time.perf_counter()
+            elapsed = (now - prev) * 1000
+            prev = now
+
+            if not self._paused: self._seek(self._time + elapsed * self._speed)
+
+            # Visualize
+            frame_countdown -= elapsed
+            if frame_countdown <= 0:
+                changed_rects = self._camera.render(
+                    self._replay,
+                    self._replay.carrier,
+                    self._replay.huskies,
+                    self._replay.litter,
+                    self._paused,
+                    self._replay.time
+                )
+                pygame.display.update(changed_rects)
+                frame_countdown = 50
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Replay a run recorded with main.py --record")
+    parser.add_argument("trace")
+    parser.add_argument("--speed", type = float, default = 1, help = "playback speed, relative to the recorded run")
+    args = parser.parse_args()
+
+    Player(args.trace, args.speed).run()
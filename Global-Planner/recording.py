@@ -0,0 +1,167 @@
+import chunks
+import json
+import numpy
+import struct
+import tasks
+
+MAGIC = b"GPTR"
+VERSION = 2
+
+# A trace starts with the magic, then the version and length of a JSON header describing the run
+_HEADER = struct.Struct("<II")
+
+# Then come the frames, each prefixed by its length so a reader can index them without decoding them
+_LENGTH = struct.Struct("<I")
+
+# A frame starts with the time, the carrier pose and the planner's offset along the corridor, then the count of each
+# record that follows, in order: huskies, removed litter ids, newly explored cells, frontier cells, queued tasks, robots
+_FRAME = struct.Struct("<IdddIIIIII")
+
+_HUSKY = numpy.dtype([("id", "<u2"), ("x", "<f8"), ("y", "<f8"), ("a", "<f8")])
+_LITTER_ID = numpy.dtype("<u4")
+_CELL = numpy.dtype([("row", "<i4"), ("col", "<i2")])
+_QUEUED_TASK = numpy.dtype([("x", "<i4"), ("absolute_y", "<i4")])
+_ROBOT = numpy.dtype([("id", "<u2"), ("x", "<i4"), ("y", "<i4"), ("a", "<f8"), ("todo", "<u1")])
+
+# Each robot's todo list follows the robots, as task kinds and locations along the corridor
+_TODO = numpy.dtype([("kind", "<u1"), ("x", "<i4"), ("absolute_y", "<i4")])
+
+RETRIEVE = 0
+SERVICE = 1
+EXPLORE = 2
+
+def _get_kind(task):
+    if isinstance(task, tasks.Retrieve): return RETRIEVE
+    if isinstance(task, tasks.Service): return SERVICE
+    if isinstance(task, tasks.Explore): return EXPLORE
+
+    raise Exception(f"{task} not recognized.")
+
+class Recorder:
+    """
+    Writes a compact binary trace of a run, one frame per call to record, for player.py to replay without running the
+    simulation. Map cells and litter are written as they change; poses, the frontier and tasks are written whole.
+    """
+    def __init__(self, filename, header, grid):
+        self._file = open(filename, "wb")
+
+        header = json.dumps(header).encode()
+        self._file.write(MAGIC + _HEADER.pack(VERSION, len(header)) + header)
+
+        self._removed_litter_ids = []
+        self._new_cells = chunks.NewCellTracker(grid)
+
+    def remove_litter(self, id):
+        self._removed_litter_ids.append(id)
+
+    def record(self, time, carrier, huskies, planner):
+        husky_records = numpy.array(
+            [(id, husky.pose.x, husky.pose.y, husky.pose.a) for id, husky in huskies.items()],
+            dtype = _HUSKY
+        )
+        removed_litter_ids = numpy.array(self._removed_litter_ids, dtype = _LITTER_ID)
+        new_rows, new_cols = self._new_cells.poll()
+        new_cells = numpy.empty(len(new_rows), dtype = _CELL)
+        new_cells["row"] = new_rows
+        new_cells["col"] = new_cols
+
+        frontier = numpy.array(list(planner.map.frontier), dtype = _CELL)
+        queued_tasks = numpy.array(
+            [(task.location.x, task.location.y) for task in planner.tasks.retrieval_task_queue],
+            dtype = _QUEUED_TASK
+        )
+        robot_records = numpy.array(
+            [(id, robot.pose.x, robot.pose.y, robot.pose.a, len(robot.todo)) for id, robot in planner.robots.items()],
+            dtype = _ROBOT
+        )
+        todo = numpy.array(
+            [
+                (_get_kind(task), task.location.x, task.location.y)
+                for robot in planner.robots.values() for task in robot.todo
+            ],
+            dtype = _TODO
+        )
+
+        frame = _FRAME.pack(
+            time,
+            carrier.pose.x,
+            carrier.pose.y,
+            planner.tasks.location_tracker.offset,
+            len(husky_records),
+            len(removed_litter_ids),
+            len(new_cells),
+            len(frontier),
+            len(queued_tasks),
+            len(robot_records)
+        )
+
+        records = (husky_records, removed_litter_ids, new_cells, frontier, queued_tasks, robot_records, todo)
+        frame += b"".join(record.tobytes() for record in records)
+
+        self._file.write(_LENGTH.pack(len(frame)) + frame)
+        self._removed_litter_ids.clear()
+
+    def close(self):
+        self._file.close()
+
+class Frame:
+    def __init__(self, data, offset):
+        (
+            self.time,
+            self.carrier_x,
+            self.carrier_y,
+            self.offset,
+            husky_count,
+            removed_litter_count,
+            new_cell_count,
+            frontier_count,
+            queued_task_count,
+            robot_count
+        ) = _FRAME.unpack_from(data, offset)
+
+        offset += _FRAME.size
+
+        def read(dtype, count):
+            nonlocal offset
+            records = numpy.frombuffer(data, dtype = dtype, count = count, offset = offset)
+            offset += dtype.itemsize * count
+            return records
+
+        self.huskies = read(_HUSKY, husky_count)
+        self.removed_litter_ids = read(_LITTER_ID, removed_litter_count)
+        self.new_cells = read(_CELL, new_cell_count)
+        self.frontier = read(_CELL, frontier_count)
+        self.queued_tasks = read(_QUEUED_TASK, queued_task_count)
+        self.robots = read(_ROBOT, robot_count)
+        self.todo = read(_TODO, int(self.robots["todo"].sum()))
+
+class Trace:
+    """
+    A trace written by Recorder, with its frames indexed so any one can be read without reading those before it.
+    A frame cut short by a run that died is dropped.
+    """
+    def __init__(self, filename):
+        with open(filename, "rb") as file:
+            self._data = file.read()
+
+        if not self._data.startswith(MAGIC): raise Exception(f"{filename} is not a trace.")
+
+        version, header_length = _HEADER.unpack_from(self._data, len(MAGIC))
+        if version != VERSION: raise Exception(f"Trace version {version} not recognized.")
+
+        offset = len(MAGIC) + _HEADER.size
+        self.header = json.loads(self._data[offset:offset + header_length])
+        offset += header_length
+
+        self._offsets = []
+        while offset + _LENGTH.size <= len(self._data):
+            length, = _LENGTH.unpack_from(self._data, offset)
+            if offset + _LENGTH.size + length > len(self._data): break
+
+            self._offsets.append(offset + _LENGTH.size)
+            offset += _LENGTH.size + length
+
+        self.times = [_FRAME.unpack_from(self._data, offset)[0] for offset in self._offsets]
+
+    def __len__(self): return len(self._offsets)
+    def __getitem__(self, i): return Frame(self._data, self._offsets[i])
@@ -0,0 +1,856 @@
+import chunks
+import collections
+import heapq
+import math
+import numpy
+import queue
+
+# (dr, dc, score index, sign) for each of the eight moves out of a cell; see get_traversal_cost
+_MOVES = [
+    (dr, dc, 3 if dr + dc == 0 else 1 if abs(dr + dc) == 2 else 2 if dc == 0 else 0, dr if dr != 0 else dc)
+    for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr != 0 or dc != 0
+]
+
+def get_traversal_cost(scores, current_spot, neighbor_spot):
+    dr = neighbor_spot[0] - current_spot[0]
+    dc = neighbor_spot[1] - current_spot[1]
+
+    total = abs(dr + dc)
+
+    if total == 0: return math.copysign(scores[3], dr)
+    if total == 2: return math.copysign(scores[1], dr)
+
+    if dc == 0: return math.copysign(scores[2], dr)
+    elif dr == 0: return math.copysign(scores[0], dc)
+
+def get_step_cost(resolution, scores, score_index, dr, dc):
+    """
+    The cost of a move for searches that need costs that are never negative: its length plus the magnitude of its score.
+    """
+    return resolution * math.hypot(dr, dc) + abs(scores[score_index])
+
+def get_path_cost(map, grid_path):
+    cost = 0
+    for (row, col), (next_row, next_col) in zip(grid_path, grid_path[1:]):
+        dr = next_row - row; dc = next_col - col
+        score_index = next(move[2] for move in _MOVES if move[0] == dr and move[1] == dc)
+
+        cost += get_step_cost(map.resolution, map.grid.get_scores(row, col), score_index, dr, dc)
+
+    return cost
+
+def get_line_cost(map, start_spot, goal_spot):
+    """
+    The cost of moving straight from the center of one cell to the center of another: its length plus the magnitude of
+    the score of each move between the cells it crosses, as in get_path_cost. None if it crosses an unknown cell.
+    """
+    grid = map.grid
+    (row, col), (goal_row, goal_col) = start_spot, goal_spot
+
+    rows = abs(goal_row - row); cols = abs(goal_col - col)
+    dr = 1 if goal_row > row else -1; dc = 1 if goal_col > col else -1
+
+    cost = map.resolution * math.hypot(rows, cols)
+
+    row_steps = 0; col_steps = 0
+    while row_steps < rows or col_steps < cols:
+        # Step into whichever cell the line enters next, or diagonally where it passes through a corner
+        decision = (1 + 2 * row_steps) * cols - (1 + 2 * col_steps) * rows
+        step_dr = dr if decision <= 0 else 0
+        step_dc = dc if decision >= 0 else 0
+
+        score_index = next(move[2] for move in _MOVES if move[0] == step_dr and move[1] == step_dc)
+        cost += abs(grid.get_scores(row, col)[score_index])
+
+        row += step_dr; col += step_dc
+        row_steps += abs(step_dr); col_steps += abs(step_dc)
+
+        if not grid.is_known(row, col): return None
+
+    return cost
+
+class _QueueAStar:
+    """
+    A* over (row, col) cells using a thread-safe queue.PriorityQueue and dicts of scores.
+    """
+    is_incremental = False
+
+    def __init__(self, map):
+        self.map = map
+
+    def search(self, start_spot, goal_spot):
+        goal_center = self.map.get_center_location(*goal_spot)
+
+        count = 0
+        open_queue = queue.PriorityQueue()
+
+        open_queue.put((0, count, start_spot))
+        parents_by_child = {}
+
+        g_score = dict()
+        g_score[start_spot] = 0
+
+        f_score = dict()
+        f_score[start_spot] = goal_center.distance(self.map.get_center_location(*start_spot))
+
+        open_set = {start_spot}
+
+        while not open_queue.empty():
+            f, c, current_spot = open_queue.get()
+            open_set.remove(current_spot)
+
+            if current_spot == goal_spot:
+                grid_path = [goal_spot]
+
+                while current_spot in parents_by_child:
+                    current_spot = parents_by_child[current_spot]
+                    grid_path.append(current_spot)
+
+                grid_path.reverse()
+                return grid_path
+
+            for neighbor_spot in self.map.get_all_neighbors(current_spot):
+                traversal_cost = get_traversal_cost(self.map.grid[current_spot], current_spot, neighbor_spot)
+
+                temp_g_score = g_score[current_spot] + traversal_cost
+
+                if neighbor_spot not in g_score or temp_g_score < g_score[neighbor_spot]:
+                    if current_spot in parents_by_child and parents_by_child[current_spot] == neighbor_spot: continue
+
+                    parents_by_child[neighbor_spot] = current_spot
+                    g_score[neighbor_spot] = temp_g_score
+
+                    h_score = goal_center.distance(self.map.get_center_location(*neighbor_spot))
+                    f_score[neighbor_spot] = temp_g_score + h_score
+
+                    if neighbor_spot not in open_set:
+                        count += 1
+                        open_queue.put(
+                            (
+                                f_score[neighbor_spot],
+                                count,
+                                neighbor_spot
+                            )
+                        )
+                        open_set.add(neighbor_spot)
+
+        return None
+
+class _HeapAStar:
+    """
+    Single-threaded A* using heapq and a closed set. Cells are integer indices (row * cols + col), and the heuristic
+    is the distance between cell centers computed from those indices, so no Location is allocated per expansion.
+    """
+    is_incremental = False
+
+    def __init__(self, map):
+        self.map = map
+
+    def search(self, start_spot, goal_spot):
+        grid = self.map.grid
+        cols = grid.cols
+        resolution = self.map.resolution
+
+        if not grid.is_known(*start_spot): return None
+
+        goal_row, goal_col = goal_spot
+        goal_index = goal_row * cols + goal_col
+        start_index = start_spot[0] * cols + start_spot[1]
+
+        g_by_index = {start_index: 0}
+        parent_by_index = {}
+        closed = set()
+
+        count = 0
+        open_heap = [(resolution * math.hypot(start_spot[0] - goal_row, start_spot[1] - goal_col), count, start_index)]
+
+        while len(open_heap) > 0:
+            _, _, index = heapq.heappop(open_heap)
+
+            if index in closed: continue
+            if index == goal_index: return self._build_path(parent_by_index, index, cols)
+
+            closed.add(index)
+
+            row, col = divmod(index, cols)
+            scores = grid.get_scores(row, col)
+            g = g_by_index[index]
+
+            for dr, dc, score_index, sign in _MOVES:
+                neighbor_row = row + dr; neighbor_col = col + dc
+                if not grid.is_known(neighbor_row, neighbor_col): continue
+
+                neighbor_index = neighbor_row * cols + neighbor_col
+                if neighbor_index in closed: continue
+
+                temp_g = g + sign * abs(scores[score_index])
+                if neighbor_index in g_by_index and temp_g >= g_by_index[neighbor_index]: continue
+
+                g_by_index[neighbor_index] = temp_g
+                parent_by_index[neighbor_index] = index
+
+                h = resolution * math.hypot(neighbor_row - goal_row, neighbor_col - goal_col)
+
+                count += 1
+                heapq.heappush(open_heap, (temp_g + h, count, neighbor_index))
+
+        return None
+
+    @staticmethod
+    def _build_path(parent_by_index, goal_index, cols):
+        grid_path = [divmod(goal_index, cols)]; current_index = goal_index
+
+        while current_index in parent_by_index:
+            current_index = parent_by_index[current_index]
+            grid_path.append(divmod(current_index, cols))
+
+        grid_path.reverse()
+        return grid_path
+
+class _Field:
+    def __init__(self, first_row, last_row, revisions, move_costs, distances):
+        self.first_row = first_row
+        self.last_row = last_row
+        self.revisions = revisions
+        self.move_costs = move_costs
+        self.distances = distances
+
+class _FlowField:
+    """
+    One integration field per goal cell, shared by every search to that goal: the cost of the cheapest path from each
+    known cell in a band of rows around the goal, found by relaxing all cells at once with NumPy until nothing changes.
+    A path is read from the field by descending it from the start.
+
+    Relaxing every cell in parallel needs costs that are never negative, so each move costs its length plus the
+    magnitude of its score, rather than the signed score alone like the A* searches.
+    """
+    is_incremental = False
+
+    def __init__(self, map, margin_rows = 8, max_fields = 64):
+        self.map = map
+
+        self._margin_rows = margin_rows
+        self._max_fields = max_fields
+        self._fields = collections.OrderedDict()
+
+    def _get_revisions(self, first_row, last_row):
+        grid = self.map.grid
+        return tuple(
+            grid.get_revision(block)
+            for block in range(grid.get_block(first_row), grid.get_block(last_row) + 1)
+        )
+
+    def _build_field(self, goal_spot, first_row, last_row, previous_field = None):
+        scores, known = self.map.grid.get_window(first_row, last_row)
+        rows, cols = known.shape
+
+        padded_known = numpy.pad(known, 1)
+
+        # The cost of each move out of every cell in the band, infinite unless both ends are known
+        move_costs = []
+        for dr, dc, score_index, _ in _MOVES:
+            costs = self.map.resolution * math.hypot(dr, dc) + numpy.abs(scores[:, :, score_index].astype(float))
+
+            neighbor_known = padded_known[1 + dr:1 + dr + rows, 1 + dc:1 + dc + cols]
+            costs[~(known & neighbor_known)] = numpy.inf
+
+            move_costs.append(costs)
+
+        # Distances are kept inside a border of infinities, so the neighbors in each direction are a view of the array
+        distances = numpy.full((rows + 2, cols + 2), numpy.inf)
+        interior = distances[1:-1, 1:-1]
+
+        # Cells are only ever added to the map, which can only shorten paths, so the distances of the field this one
+        # replaces are upper bounds that relaxation lowers to the new distances in a few sweeps
+        if previous_field is not None:
+            overlap_first = max(first_row, previous_field.first_row)
+            overlap_last = min(last_row, previous_field.last_row)
+
+            interior[overlap_first - first_row:overlap_last - first_row + 1] = previous_field.distances[
+                1 + overlap_first - previous_field.first_row:2 + overlap_last - previous_field.first_row, 1:-1
+            ]
+
+        interior[goal_spot[0] - first_row, goal_spot[1]] = 0
+
+        neighbors = [distances[1 + dr:1 + dr + rows, 1 + dc:1 + dc + cols] for dr, dc, _, _ in _MOVES]
+        previous = numpy.empty_like(interior)
+        candidates = numpy.empty_like(interior)
+
+        while True:
+            numpy.copyto(previous, interior)
+
+            for costs, neighbor in zip(move_costs, neighbors):
+                numpy.add(costs, neighbor, out = candidates)
+                numpy.minimum(interior, candidates, out = interior)
+
+            if numpy.array_equal(interior, previous): break
+
+        return _Field(first_row, last_row, self._get_revisions(first_row, last_row), move_costs, distances)
+
+    def _get_field(self, start_spot, goal_spot):
+        """
+        The goal's field, reused if it covers the start and no block it spans has changed, else rebuilt over a band
+        wide enough for both this start and the ones it was built for.
+        """
+        first_row = min(start_spot[0], goal_spot[0]) - self._margin_rows
+        last_row = max(start_spot[0], goal_spot[0]) + self._margin_rows
+
+        field = self._fields.get(goal_spot)
+        if field is not None:
+            self._fields.move_to_end(goal_spot)
+
+            covers_start = field.first_row <= start_spot[0] <= field.last_row
+            if covers_start and field.revisions == self._get_revisions(field.first_row, field.last_row): return field
+
+            first_row = min(first_row, field.first_row)
+            last_row = max(last_row, field.last_row)
+
+        field = self._build_field(goal_spot, max(first_row, 0), last_row, field)
+
+        self._fields[goal_spot] = field
+        if len(self._fields) > self._max_fields: self._fields.popitem(last = False)
+
+        return field
+
+    def search(self, start_spot, goal_spot):
+        grid = self.map.grid
+        if not grid.is_known(*start_spot) or not grid.is_known(*goal_spot): return None
+
+        field = self._get_field(start_spot, goal_spot)
+        if field.distances[1 + start_spot[0] - field.first_row, 1 + start_spot[1]] == numpy.inf: return None
+
+        # Descend the field, moving each time to the neighbor that leaves the least cost to the goal
+        row = start_spot[0] - field.first_row; col = start_spot[1]
+        goal_row = goal_spot[0] - field.first_row; goal_col = goal_spot[1]
+
+        grid_path = [start_spot]
+        while (row, col) != (goal_row, goal_col):
+            best_cost = numpy.inf
+
+            for (dr, dc, _, _), costs in zip(_MOVES, field.move_costs):
+                cost = costs[row, col]
+                if cost == numpy.inf: continue
+
+                cost += field.distances[1 + row + dr, 1 + col + dc]
+                if cost < best_cost: best_cost = cost; best_move = (dr, dc)
+
+            row += best_move[0]; col += best_move[1]
+            grid_path.append((row + field.first_row, col))
+
+        return grid_path
+
+class _DStarState:
+    """
+    A search from one goal kept between searches for one key: the g and rhs values by cell index, the open heap with
+    the current key of each open cell, the key modifier, the start it was last searched from, and the cells known since.
+    """
+    def __init__(self, goal_index):
+        self.goal_index = goal_index
+
+        self.g_by_index = {}
+        self.rhs_by_index = {goal_index: 0}
+
+        self.open_heap = []
+        self.key_by_index = {}
+        self.count = 0
+
+        self.km = 0
+        self.last_start_index = None
+        self.new_cells = []
+
+class _DStarLite:
+    """
+    D* Lite (Koenig and Likhachev, 2002), keeping one backward search from the goal per key, like a robot id. When the
+    same key searches again to the same goal, the search is repaired from the cells known since rather than repeated,
+    so only the part of the map around those cells is expanded again. Searches without a key start over.
+
+    Like the flow field, moves cost their length plus the magnitude of their score, so costs are never negative.
+    """
+    is_incremental = True
+
+    def __init__(self, map, max_states = 64):
+        self.map = map
+
+        self._max_states = max_states
+        self._states = collections.OrderedDict()
+        self._new_cells = chunks.NewCellTracker(map.grid)
+
+    # Graph
+    def _get_heuristic(self, index, other_index):
+        row, col = divmod(index, self.map.grid.cols)
+        other_row, other_col = divmod(other_index, self.map.grid.cols)
+        return self.map.resolution * math.hypot(row - other_row, col - other_col)
+
+    def _get_successors(self, index):
+        grid = self.map.grid
+        row, col = divmod(index, grid.cols)
+        scores = grid.get_scores(row, col)
+
+        for dr, dc, score_index, _ in _MOVES:
+            if not grid.is_known(row + dr, col + dc): continue
+            yield (row + dr) * grid.cols + col + dc, get_step_cost(self.map.resolution, scores, score_index, dr, dc)
+
+    def _get_predecessors(self, index):
+        grid = self.map.grid
+        row, col = divmod(index, grid.cols)
+
+        for dr, dc, score_index, _ in _MOVES:
+            if not grid.is_known(row - dr, col - dc): continue
+
+            scores = grid.get_scores(row - dr, col - dc)
+            yield (row - dr) * grid.cols + col - dc, get_step_cost(self.map.resolution, scores, score_index, dr, dc)
+
+    def _get_best_rhs(self, state, index):
+        return min(
+            (cost + state.g_by_index.get(successor, math.inf) for successor, cost in self._get_successors(index)),
+            default = math.inf
+        )
+
+    # Queue
+    def _get_key(self, state, index, start_index):
+        k2 = min(state.g_by_index.get(index, math.inf), state.rhs_by_index.get(index, math.inf))
+        return (k2 + self._get_heuristic(start_index, index) + state.km, k2)
+
+    def _update(self, state, index, start_index):
+        if state.g_by_index.get(index, math.inf) == state.rhs_by_index.get(index, math.inf):
+            state.key_by_index.pop(index, None)
+            return
+
+        key = self._get_key(state, index, start_index)
+        if state.key_by_index.get(index) == key: return
+
+        state.key_by_index[index] = key
+        state.count += 1
+        heapq.heappush(state.open_heap, (key, state.count, index))
+
+    # Search
+    def _notify_new_cells(self, state, start_index):
+        for rows, cols in state.new_cells:
+            for index in (rows * self.map.grid.cols + cols).tolist():
+                if index == state.goal_index: continue
+
+                # New cells only add moves, so their own rhs is the only one that can drop until they are expanded
+                rhs = self._get_best_rhs(state, index)
+                if rhs < state.rhs_by_index.get(index, math.inf):
+                    state.rhs_by_index[index] = rhs
+                    self._update(state, index, start_index)
+
+        state.new_cells.clear()
+
+    def _compute_shortest_path(self, state, start_index):
+        g_by_index = state.g_by_index
+        rhs_by_index = state.rhs_by_index
+
+        while len(state.open_heap) > 0:
+            key, _, index = state.open_heap[0]
+
+            # Skip entries left behind when a cell was queued again or made consistent
+            if state.key_by_index.get(index) != key:
+                heapq.heappop(state.open_heap)
+                continue
+
+            start_consistent = rhs_by_index.get(start_index, math.inf) == g_by_index.get(start_index, math.inf)
+            if start_consistent and key >= self._get_key(state, start_index, start_index): break
+
+            heapq.heappop(state.open_heap)
+
+            new_key = self._get_key(state, index, start_index)
+            if key < new_key:
+                state.key_by_index[index] = new_key
+                state.count += 1
+                heapq.heappush(state.open_heap, (new_key, state.count, index))
+                continue
+
+            del state.key_by_index[index]
+
+            g = g_by_index.get(index, math.inf)
+            rhs = rhs_by_index.get(index, math.inf)
+
+            if g > rhs:
+                g_by_index[index] = rhs
+
+                for predecessor, cost in self._get_predecessors(index):
+                    if predecessor != state.goal_index and cost + rhs < rhs_by_index.get(predecessor, math.inf):
+                        rhs_by_index[predecessor] = cost + rhs
+
+                    self._update(state, predecessor, start_index)
+
+            else:
+                g_by_index[index] = math.inf
+
+                for predecessor, cost in list(self._get_predecessors(index)) + [(index, None)]:
+                    if predecessor != state.goal_index:
+                        if predecessor == index or rhs_by_index.get(predecessor, math.inf) == cost + g:
+                            rhs_by_index[predecessor] = self._get_best_rhs(state, predecessor)
+
+                    self._update(state, predecessor, start_index)
+
+    def _get_state(self, key, goal_index, start_index):
+        state = self._states.get(key)
+
+        if state is None or state.goal_index != goal_index:
+            state = _DStarState(goal_index)
+            self._update(state, goal_index, start_index)
+
+        self._states[key] = state
+        self._states.move_to_end(key)
+        if len(self._states) > self._max_states: self._states.popitem(last = False)
+
+        return state
+
+    def search(self, start_spot, goal_spot, key = None):
+        grid = self.map.grid
+        if not grid.is_known(*start_spot) or not grid.is_known(*goal_spot): return None
+
+        new_cells = self._new_cells.poll()
+        if len(new_cells[0]) > 0:
+            for state in self._states.values(): state.new_cells.append(new_cells)
+
+        start_index = start_spot[0] * grid.cols + start_spot[1]
+        goal_index = goal_spot[0] * grid.cols + goal_spot[1]
+
+        if key is None:
+            state = _DStarState(goal_index)
+            self._update(state, goal_index, start_index)
+
+        else: state = self._get_state(key, goal_index, start_index)
+
+        # Moving the start lowers every heuristic by at most the distance moved, which the key modifier makes up for
+        if state.last_start_index is not None and state.last_start_index != start_index:
+            state.km += self._get_heuristic(state.last_start_index, start_index)
+
+        state.last_start_index = start_index
+
+        self._notify_new_cells(state, start_index)
+        self._compute_shortest_path(state, start_index)
+
+        if state.g_by_index.get(start_index, math.inf) == math.inf: return None
+
+        # Follow the cheapest move out of each cell to the goal
+        grid_path = [start_spot]; index = start_index
+        while index != goal_index and len(grid_path) <= len(state.g_by_index):
+            index = min(
+                self._get_successors(index),
+                key = lambda successor: successor[1] + state.g_by_index.get(successor[0], math.inf)
+            )[0]
+            grid_path.append(divmod(index, grid.cols))
+
+        return grid_path if index == goal_index else None
+
+class _Cluster:
+    def __init__(self, revisions, scores, known, edges_by_index, crossings_by_index, links_by_entrance):
+        self.revisions = revisions
+        self.scores = scores
+        self.known = known
+
+        self.edges_by_index = edges_by_index
+        self.crossings_by_index = crossings_by_index
+        self.links_by_entrance = links_by_entrance
+        self.entrances = list(links_by_entrance)
+
+        self.searches_by_entrance = {}
+
+class _HierarchicalAStar:
+    """
+    HPA* (Botea, Muller and Schaeffer, 2004) over the corridor cut into clusters of cluster_rows full-width rows, with
+    entrances along each run of known cells that can cross a cluster border. Searches from each entrance to the rest of
+    its cluster are cached until the cells under the cluster change, so a search runs A* over the entrances and stitches
+    the cached paths together, expanding cells only in the start's cluster however far away the goal is. Goals in the
+    same or the next cluster are searched directly.
+
+    Like the flow field, moves cost their length plus the magnitude of their score, so costs are never negative.
+    Paths are near optimal: they only cross cluster borders at entrances.
+    """
+    is_incremental = False
+
+    def __init__(self, map, cluster_rows = 16, entrance_spacing = 5, max_clusters = 1024):
+        self.map = map
+
+        self._cluster_rows = cluster_rows
+        self._entrance_spacing = entrance_spacing
+        self._max_clusters = max_clusters
+        self._clusters = collections.OrderedDict()
+
+    # Clusters
+    def _get_revisions(self, first_row, last_row):
+        grid = self.map.grid
+        return tuple(grid.get_revision(block) for block in range(grid.get_block(first_row), grid.get_block(last_row) + 1))
+
+    def _get_entrances(self, first_row, known_rows, score_rows):
+        """
+        The entrances on both borders of a cluster, each linked to a cell across the border with the cost of moving
+        there. Each run of crossings gets an entrance at both ends and straight across every entrance_spacing columns
+        between, so paths need not detour far to reach one.
+        """
+        cols = self.map.grid.cols
+        last_row = first_row + self._cluster_rows - 1
+
+        links_by_entrance = {}
+        for row, outside_row, dr in ((first_row, first_row - 1, -1), (last_row, last_row + 1, 1)):
+            # The window starts a row before the cluster
+            local_row = row - first_row + 1; outside_local_row = outside_row - first_row + 1
+
+            crossings = [
+                (col, dc) for col in range(cols) for dc in (-1, 0, 1)
+                if known_rows[local_row][col] and 0 <= col + dc < cols and known_rows[outside_local_row][col + dc]
+            ]
+
+            # Consecutive crossings are in one run while the cells on both sides touch, so every crossing in a run
+            # connects the same cells inside to the same cells outside
+            runs = []
+            for col, dc in crossings:
+                if len(runs) > 0 and col - runs[-1][-1][0] <= 1 and abs(col + dc - sum(runs[-1][-1])) <= 1: runs[-1].append((col, dc))
+                else: runs.append([(col, dc)])
+
+            for run in runs:
+                picks = {run[0], run[-1]}
+                picks.update((col, dc) for col, dc in run if dc == 0 and col % self._entrance_spacing == 0)
+
+                for entrance_col, dc in picks:
+                    score_index = next(move[2] for move in _MOVES if move[0] == dr and move[1] == dc)
+                    cost = get_step_cost(self.map.resolution, score_rows[local_row][entrance_col], score_index, dr, dc)
+
+                    links_by_entrance.setdefault(row * cols + entrance_col, []).append((outside_row * cols + entrance_col + dc, cost))
+
+        return links_by_entrance
+
+    def _create_cluster(self, cluster, revisions, scores, known):
+        cols = self.map.grid.cols
+        first_row = cluster * self._cluster_rows
+
+        known_rows = known.tolist()
+        score_rows = scores.tolist()
+
+        # The moves out of every known cell by cell index, split into those that stay inside the cluster and those that
+        # cross a border
+        edges_by_index = {}
+        crossings_by_index = {}
+        for local_row in range(1, self._cluster_rows + 1):
+            for col in range(cols):
+                if not known_rows[local_row][col]: continue
+
+                index = (first_row + local_row - 1) * cols + col
+                cell_scores = score_rows[local_row][col]
+
+                edges = edges_by_index[index] = []
+                for dr, dc, score_index, _ in _MOVES:
+                    if not 0 <= col + dc < cols or not known_rows[local_row + dr][col + dc]: continue
+
+                    edge = (index + dr * cols + dc, get_step_cost(self.map.resolution, cell_scores, score_index, dr, dc))
+                    if 1 <= local_row + dr <= self._cluster_rows: edges.append(edge)
+                    else: crossings_by_index.setdefault(index, []).append(edge)
+
+        links_by_entrance = self._get_entrances(first_row, known_rows, score_rows)
+        return _Cluster(revisions, scores, known, edges_by_index, crossings_by_index, links_by_entrance)
+
+    def _get_cluster(self, cluster):
+        # Entrances depend on the rows just outside the cluster too
+        first_row = cluster * self._cluster_rows - 1
+        last_row = first_row + self._cluster_rows + 1
+
+        revisions = self._get_revisions(max(first_row, 0), last_row)
+
+        data = self._clusters.get(cluster)
+        if data is not None and data.revisions == revisions:
+            self._clusters.move_to_end(cluster)
+            return data
+
+        # Blocks are revised whenever any of their cells are written, often without changing this cluster's
+        scores, known = self.map.grid.get_window(first_row, last_row)
+        if data is not None and numpy.array_equal(data.known, known) and numpy.array_equal(data.scores, scores):
+            data.revisions = revisions
+            self._clusters.move_to_end(cluster)
+            return data
+
+        data = self._create_cluster(cluster, revisions, scores, known)
+
+        self._clusters[cluster] = data
+        self._clusters.move_to_end(cluster)
+        if len(self._clusters) > self._max_clusters: self._clusters.popitem(last = False)
+
+        return data
+
+    # Search
+    @staticmethod
+    def _search_cluster(cluster, start_index):
+        """
+        Dijkstra from a cell to every cell of its cluster, returning the costs and parents by cell index.
+        """
+        cost_by_index = {start_index: 0}
+        parent_by_index = {}
+        closed = set()
+        open_heap = [(0, start_index)]
+
+        while len(open_heap) > 0:
+            cost, index = heapq.heappop(open_heap)
+            if index in closed: continue
+
+            closed.add(index)
+
+            for neighbor_index, step_cost in cluster.edges_by_index[index]:
+                neighbor_cost = cost + step_cost
+
+                if neighbor_cost < cost_by_index.get(neighbor_index, math.inf):
+                    cost_by_index[neighbor_index] = neighbor_cost
+                    parent_by_index[neighbor_index] = index
+                    heapq.heappush(open_heap, (neighbor_cost, neighbor_index))
+
+        return cost_by_index, parent_by_index
+
+    def _search_near(self, start_index, goal_index):
+        """
+        A* over every cell of the clusters from the start's to the goal's, for goals too near for the detour through
+        entrances to be worth it.
+        """
+        cols = self.map.grid.cols
+        goal_row, goal_col = divmod(goal_index, cols)
+
+        first_cluster, last_cluster = sorted((start_index // cols // self._cluster_rows, goal_index // cols // self._cluster_rows))
+        clusters_by_index = {index: self._get_cluster(index) for index in range(first_cluster, last_cluster + 1)}
+
+        first_index = first_cluster * self._cluster_rows * cols
+        last_index = (last_cluster + 1) * self._cluster_rows * cols - 1
+
+        cost_by_index = {start_index: 0}
+        parent_by_index = {}
+        closed = set()
+        open_heap = [(0, start_index)]
+
+        while len(open_heap) > 0:
+            _, index = heapq.heappop(open_heap)
+            if index == goal_index: return self._get_segment(parent_by_index, goal_index)
+            if index in closed: continue
+
+            closed.add(index)
+
+            cluster = clusters_by_index[index // cols // self._cluster_rows]
+            cost = cost_by_index[index]
+
+            for neighbor_index, step_cost in (*cluster.edges_by_index[index], *cluster.crossings_by_index.get(index, ())):
+                if not first_index <= neighbor_index <= last_index: continue
+
+                neighbor_cost = cost + step_cost
+                if neighbor_cost < cost_by_index.get(neighbor_index, math.inf):
+                    cost_by_index[neighbor_index] = neighbor_cost
+                    parent_by_index[neighbor_index] = index
+
+                    row, col = divmod(neighbor_index, cols)
+                    heuristic = self.map.resolution * math.hypot(row - goal_row, col - goal_col)
+                    heapq.heappush(open_heap, (neighbor_cost + heuristic, neighbor_index))
+
+        return None
+
+    def _get_edges(self, cluster, index, cache = True):
+        """
+        The search of the cluster from a cell along with the edges of the abstract graph out of it: to each entrance of
+        the cluster it reaches and across the border if the cell is an entrance. Diagonal crossings can land beside an
+        entrance, so any cell reached across a border can be searched from.
+        """
+        try: return cluster.searches_by_entrance[index]
+        except KeyError: pass
+
+        cost_by_index, parent_by_index = self._search_cluster(cluster, index)
+
+        edges = [(other, cost_by_index[other], parent_by_index) for other in cluster.entrances if other in cost_by_index and other != index]
+        edges.extend((linked, cost, None) for linked, cost in cluster.links_by_entrance.get(index, ()))
+
+        search = (cost_by_index, parent_by_index, edges)
+        if cache: cluster.searches_by_entrance[index] = search
+
+        return search
+
+    @staticmethod
+    def _get_segment(parent_by_index, index):
+        segment = [index]
+        while index in parent_by_index:
+            index = parent_by_index[index]
+            segment.append(index)
+
+        segment.reverse()
+        return segment
+
+    def search(self, start_spot, goal_spot):
+        grid = self.map.grid
+        cols = grid.cols
+        if not grid.is_known(*start_spot) or not grid.is_known(*goal_spot): return None
+
+        start_index = start_spot[0] * cols + start_spot[1]
+        goal_index = goal_spot[0] * cols + goal_spot[1]
+
+        start_cluster = start_spot[0] // self._cluster_rows
+        goal_cluster = goal_spot[0] // self._cluster_rows
+
+        # Search the cells directly when the goal is in the same or the next cluster, before trying the way around
+        if abs(start_cluster - goal_cluster) <= 1:
+            indices = self._search_near(start_index, goal_index)
+            if indices is not None: return [divmod(index, cols) for index in indices]
+
+        start_search = self._get_edges(self._get_cluster(start_cluster), start_index, cache = False)
+
+        def get_heuristic(index):
+            row, col = divmod(index, cols)
+            return self.map.resolution * math.hypot(row - goal_spot[0], col - goal_spot[1])
+
+        # A* over the entrances, where each edge is the cached path within a cluster or the move across a border
+        clusters_by_index = {}
+
+        cost_by_node = {start_index: 0}
+        parent_by_node = {}
+        closed = set()
+
+        count = 0
+        open_heap = [(get_heuristic(start_index), count, start_index)]
+
+        while len(open_heap) > 0:
+            _, _, node = heapq.heappop(open_heap)
+            if node in closed: continue
+            if node == goal_index: break
+
+            closed.add(node)
+
+            # Clusters cannot change during a search, so check each once
+            cluster_index = node // cols // self._cluster_rows
+            try: cluster = clusters_by_index[cluster_index]
+            except KeyError:
+                cluster = self._get_cluster(cluster_index)
+                clusters_by_index[cluster_index] = cluster
+
+            if node == start_index: cost_by_index, parent_by_index, edges = start_search
+            else: cost_by_index, parent_by_index, edges = self._get_edges(cluster, node)
+
+            if goal_index in cost_by_index: edges = edges + [(goal_index, cost_by_index[goal_index], parent_by_index)]
+
+            for other, edge_cost, edge_parents in edges:
+                if other in closed: continue
+
+                cost = cost_by_node[node] + edge_cost
+                if cost >= cost_by_node.get(other, math.inf): continue
+
+                cost_by_node[other] = cost
+                parent_by_node[other] = (node, edge_parents)
+
+                count += 1
+                heapq.heappush(open_heap, (cost + get_heuristic(other), count, other))
+
+        else: return None
+
+        # Refine by stitching together the cells of each edge on the way back from the goal
+        indices = [goal_index]; node = goal_index
+        while node in parent_by_node:
+            previous_node, edge_parents = parent_by_node[node]
+
+            segment = [previous_node, node] if edge_parents is None else self._get_segment(edge_parents, node)
+            indices[0:1] = segment
+
+            node = previous_node
+
+        return [divmod(index, cols) for index in indices]
+
+def create(name, map):
+    if name == "queue": return _QueueAStar(map)
+    if name == "heap": return _HeapAStar(map)
+    if name == "flow": return _FlowField(map)
+    if name == "dstar": return _DStarLite(map)
+    if name == "hpa": return _HierarchicalAStar(map)
+
+    raise Exception(f"Search engine {name} not recognized.")
@@ -0,0 +1,103 @@
+import assignment
+import numpy
+import time
+
+class _FixedOrder:
+    """
+    Leave tasks in the order they were assigned.
+    """
+    def order(self, flow, start, tasks):
+        return list(tasks)
+
+class _InsertionTwoOpt:
+    """
+    Build a route from the start through every task by nearest insertion, then improve it with 2-opt moves until none
+    helps or the time limit runs out. Distances are asymmetric, since moving back down the corridor costs double, so
+    each move is scored by the cost of the whole route rather than only the edges it swaps.
+    """
+    def __init__(self, time_limit_ms = 5):
+        self._time_limit = time_limit_ms / 1000
+
+    def order(self, flow, start, tasks):
+        if len(tasks) < 2: return list(tasks)
+
+        deadline = time.perf_counter() + self._time_limit
+
+        # Stop 0 is the start, and stop i is task i - 1
+        cost = flow.distance_matrix([start, *(task.location for task in tasks)], [start, *(task.location for task in tasks)])
+        cost[~numpy.isfinite(cost)] = assignment.INFEASIBLE
+        cost = cost.tolist()
+
+        route = self._insert(cost)
+        route = self._improve(cost, route, deadline)
+
+        return [tasks[stop - 1] for stop in route[1:]]
+
+    @staticmethod
+    def _get_cost(cost, route):
+        return sum(cost[stop][next_stop] for stop, next_stop in zip(route, route[1:]))
+
+    @staticmethod
+    def _insert(cost):
+        """
+        Repeatedly take the task nearest to any stop on the route, and insert it where it adds the least cost.
+        """
+        route = [0]
+        remaining = set(range(1, len(cost)))
+
+        while len(remaining) > 0:
+            stop = min(remaining, key = lambda s: (min(cost[r][s] for r in route), s))
+            remaining.remove(stop)
+
+            # Inserting before position i, or appending at the end of the route where there is no edge to replace
+            best_position = len(route)
+            best_increase = cost[route[-1]][stop]
+
+            for i in range(1, len(route)):
+                increase = cost[route[i - 1]][stop] + cost[stop][route[i]] - cost[route[i - 1]][route[i]]
+                if increase < best_increase:
+                    best_position = i
+                    best_increase = increase
+
+            route.insert(best_position, stop)
+
+        return route
+
+    def _improve(self, cost, route, deadline):
+        """
+        Reverse sections of the route, or move single stops, while that makes it cheaper, keeping the start first.
+        Reversing alone rarely helps when a section would be run back down the corridor, so stops are also moved.
+        """
+        route_cost = self._get_cost(cost, route)
+
+        improved = True
+        while improved:
+            improved = False
+
+            for i in range(1, len(route)):
+                for j in range(1, len(route)):
+                    if i == j: continue
+                    if time.perf_counter() > deadline: return route
+
+                    moved = route[:i] + route[i + 1:]
+                    moved.insert(j, route[i])
+
+                    candidates = [moved]
+                    if i < j: candidates.append(route[:i] + route[i:j + 1][::-1] + route[j + 1:])
+
+                    for candidate in candidates:
+                        candidate_cost = self._get_cost(cost, candidate)
+                        if candidate_cost >= route_cost - 1e-9: continue
+
+                        route = candidate
+                        route_cost = candidate_cost
+                        improved = True
+                        break
+
+        return route
+
+def create(name):
+    if name == "none": return _FixedOrder()
+    if name == "tsp": return _InsertionTwoOpt()
+
+    raise Exception(f"Sequencing engine {name} not recognized.")
@@ -2,13 +2,17 @@ import actions
 import camera
 import debug
 import entities
+import events
 import grid
 import json
+import math
 import metrics
 import pygame
-import random
+import recording
+import spatial
 import time
 import types
+import util
 
 class _IntervalTimer:
     def __init__(self, interval, func):
@@ -22,30 +26,48 @@ class _IntervalTimer:
             self._func(*args, **kwargs)
             self._countdown = self._interval
 
-class _EventPump:
-    def __init__(self, owner):
-        self._owner_id = id(owner)
-        self._handlers = {}
+    def get_time_to_fire(self, dt):
+        """
+        When ticked in steps of dt, the time from the start of this step to the end of the step in which the timer fires.
+        """
+        return max(math.ceil(self._countdown / dt), 1) * dt
 
-    def handle(self, event, handler):
-        try: self._handlers[event].append(handler)
-        except KeyError: self._handlers[event] = [handler]
+    def skip(self, time):
+        """
+        Count down the time without firing, for steps before the one given by get_time_to_fire.
+        """
+        self._countdown -= time
 
-    def process(self, caller):
-        if id(caller) != self._owner_id:
-            raise Exception(f"Caller {caller} is not authorized to call {self.process}")
+def _apply_override(config, path, value):
+    """
+    Set a value in the raw config by its dotted path, for example "carrier.speed_mph".
+    """
+    *sections, key = path.split(".")
+    for section in sections: config = config[section]
 
-        for event in pygame.event.get():
-            if event.type in self._handlers:
-                for handler in self._handlers[event.type]:
-                    handler(event)
+    if key not in config: raise KeyError(f"{path} is not a config setting.")
+    config[key] = value
 
 class Simulation:
-    def __init__(self, filename):
-        pygame.init()
+    def __init__(self, filename, headless = False, overrides = None, metrics_directory = "data", trace_filename = None):
+        self._headless = headless
+        self._trace_filename = trace_filename
+        self._recorder = None
+
+        # Headless runs never open a window, so there is nothing in pygame to initialize
+        if not self._headless: pygame.init()
 
         with open(filename, "r") as file:
-            config = json.load(file, object_hook = lambda d: types.SimpleNamespace(**d))
+            raw_config = json.load(file)
+
+        for path, value in (overrides or {}).items():
+            _apply_override(raw_config, path, value)
+
+        config = json.loads(json.dumps(raw_config), object_hook = lambda d: types.SimpleNamespace(**d))
+
+        self.seed = config.simulation.seed
+
+        metrics.start(metrics_directory, config.metrics.chunk_rows, config.metrics.downsample_ms)
 
         self._run_time_ms = config.simulation.run_time_sec * 1000
         self._dt = config.simulation.step_delta_ms
@@ -54,7 +76,8 @@ class Simulation:
         self._grid = grid.Grid(
             config.terrain.width_mm,
             config.terrain.height_mm,
-            config.terrain.resolution_mm
+            config.terrain.resolution_mm,
+            util.create_rng(self.seed, "terrain")
         )
 
         # Interval Timers
@@ -78,10 +101,17 @@ class Simulation:
             self._sync_robots
         )
 
+        self._record_timer = _IntervalTimer(
+            config.recording.interval_ms,
+            self._record
+        )
+
         # Entities
         self._carrier = entities.Carrier(config.carrier.speed_mph * 0.44704)
 
-        random.seed(1000)
+        # Space the huskies 2 m apart across the road, or closer if there are too many to fit
+        max_id = max((id for end_effector in config.robots.end_effectors for id in end_effector.robots), default = 1)
+        spacing = min(2000, config.terrain.width_mm // max_id)
 
         self._huskies = dict()
         for end_effector in config.robots.end_effectors:
@@ -98,12 +128,12 @@ class Simulation:
                     end_effector.name
                 )
 
-                self._huskies[id].pose.x = 500 + 2000 * (id - 1)
+                self._huskies[id].pose.x = 500 + spacing * (id - 1)
                 self._huskies[id].pose.y = 500
                 self._huskies[id].pose.a = 90
 
-        self._litter = dict()
-        self._collected_litter = set()
+        self._litter = spatial.SpatialHash(config.terrain.resolution_mm)
+        self._collected_count = 0
 
         hat = []
         for trash_spec in config.litter.distribution:
@@ -112,10 +142,11 @@ class Simulation:
         assert len(hat) == 100, f"Litter distribution percentages total {len(hat)}."
 
         padding = config.terrain.resolution_mm
+        litter_rng = util.create_rng(self.seed, "litter")
 
         for i in range(config.litter.total):
-            trash_spec = random.choice(hat)
-            certainty = random.uniform(*trash_spec.certainty)
+            trash_spec = litter_rng.choice(hat)
+            certainty = litter_rng.uniform(*trash_spec.certainty)
 
             trash = entities.Trash(
                 i + 1,
@@ -125,30 +156,37 @@ class Simulation:
                 trash_spec.end_effectors
             )
 
-            trash.pose.x = random.randint(padding, config.terrain.width_mm - padding)
-            trash.pose.y = random.randint(padding, config.terrain.height_mm - padding)
+            trash.pose.x = litter_rng.randint(padding, config.terrain.width_mm - padding)
+            trash.pose.y = litter_rng.randint(padding, config.terrain.height_mm - padding)
 
             self._litter[trash.id] = trash
 
-        self._events = _EventPump(self)
+        self._paused = not self._headless
+        self._finished = False
+
+        if self._headless: return
+
+        self._events = events.EventPump(self)
         self._events.handle(pygame.QUIT, self._on_quit)
         self._events.handle(pygame.KEYDOWN, self._on_keydown)
 
         surface = pygame.display.set_mode((700, 1000))
         pygame.display.set_caption("Global Planner Simulator")
-        self._camera = camera.Camera(surface, self._events)
-
-        self._paused = True
-        self._finished = False
+        self._camera = camera.Camera(
+            surface,
+            self._events,
+            controls = ["Simulation:", "P - Toggle Pause", "R - Print profiler report"]
+        )
 
     # Event Handlers
     def _on_quit(self, _):
-        metrics.save()
+        self._finish()
         pygame.quit()
         quit(0)
 
     def _on_keydown(self, event):
         if event.key == pygame.K_p: self._paused = not self._paused
+        if event.key == pygame.K_r: debug.report()
 
     # Interval Functions
     @debug.profiled
@@ -174,10 +212,8 @@ class Simulation:
 
             litter = husky.get_visible_litter(self._litter)
             for trash in litter:
-                trash_id = trash[0]
-                if trash_id not in metrics.discovery_time_by_id:
-                    trash = self._litter[trash_id]
-                    metrics.discovery_time_by_id[trash_id] = (trash.type, trash.pose.location, self._now)
+                trash = self._litter[trash[0]]
+                metrics.record_discovery(trash.id, trash.type, trash.pose.location, self._now)
 
             next_task_please = len(husky.actions) == 0
 
@@ -189,9 +225,77 @@ class Simulation:
         for id, commands in plan.items():
             self._huskies[id].execute(commands)
 
+    @debug.profiled
+    def _record(self, planner):
+        self._recorder.record(self._now, self._carrier, self._huskies, planner)
+
+    # Recording
+    def _get_trace_header(self, planner):
+        return {
+            "run_time_ms": self._run_time_ms,
+            "lane_count": len(planner.flow.lanes),
+            "huskies": [
+                {
+                    "id": id,
+                    "end_effector": husky.end_effector,
+                    "lidar_range": husky.lidar_range,
+                    "lidar_arc": husky.lidar_arc,
+                    "yolo_range": husky.yolo_range,
+                    "yolo_arc": husky.yolo_arc
+                }
+                for id, husky in self._huskies.items()
+            ],
+            "litter": [
+                [trash.id, trash.type, trash.pose.x, trash.pose.y]
+                for trash in self._litter.values()
+            ]
+        }
+
     # Run
+    def _finish(self):
+        if self._finished: return
+
+        metrics.finish()
+        if self._recorder is not None: self._recorder.close()
+
+        self._finished = True
+
+    def _get_timers(self):
+        timers = [self._sync_carrier_timer, self._sync_poses_timer, self._sync_robots_timer, self._update_plan_timer]
+        if self._recorder is not None: timers.append(self._record_timer)
+
+        return timers
+
+    def _skip_quiet_steps(self):
+        """
+        Jump over the steps before the next one in which a timer fires or a husky finishes a pick. Nothing reads the
+        entities in those steps, so the carrier, timers and huskies are advanced through them at once, and the collected
+        count, which cannot change in them, is recorded for each.
+        """
+        time = min(timer.get_time_to_fire(self._dt) for timer in self._get_timers())
+        time = min(time, math.ceil((self._run_time_ms - self._now) / self._dt) * self._dt)
+
+        # With timers due every step, as in the default config, there is nothing to skip
+        if time <= self._dt: return
+
+        for husky in self._huskies.values():
+            time_to_event = husky.get_time_to_next_event(self._dt, time)
+            if time_to_event is not None: time = min(time, time_to_event)
+
+        quiet_steps = time // self._dt - 1
+        if quiet_steps <= 0: return
+
+        self._carrier.skip(quiet_steps, self._dt)
+        for timer in self._get_timers(): timer.skip(quiet_steps * self._dt)
+        for husky in self._huskies.values(): husky.skip(quiet_steps, self._dt)
+
+        metrics.record_steady_collected(self._now + self._dt, quiet_steps, self._dt, self._collected_count)
+        self._now += quiet_steps * self._dt
+
     @debug.profiled
     def _step(self, planner):
+        self._skip_quiet_steps()
+
         self._carrier.move(self._dt)
         self._sync_carrier_timer.tick(self._dt, planner)
 
@@ -203,10 +307,12 @@ class Simulation:
                     trash_id = action.trash_id
 
                     trash = self._litter[trash_id]
-                    metrics.pick_time_by_id[trash_id] = (trash.type, trash.pose.location, self._now)
+                    metrics.record_pick(trash_id, trash.type, trash.pose.location, self._now)
 
                     del self._litter[trash_id]
-                    self._collected_litter.add(trash_id)
+                    self._collected_count += 1
+
+                    if self._recorder is not None: self._recorder.remove_litter(trash_id)
 
             husky.finished_actions.clear()
 
@@ -215,27 +321,31 @@ class Simulation:
 
         self._update_plan_timer.tick(self._dt, planner)
 
+        if self._recorder is not None: self._record_timer.tick(self._dt, planner)
+
         self._now += self._dt
-        metrics.collected_trash_by_time.append(
-            (
-                self._now,
-                len(self._collected_litter)
-            )
-        )
+        metrics.record_collected(self._now, self._collected_count)
 
     def run(self, planner):
+        """
+        Run the simulation in a window until it is closed or, when headless, as fast as possible until the configured
+        run time has elapsed, returning a summary of the metrics.
+        """
         self._sync_poses(planner)
         self._sync_robots(planner)
 
+        if self._trace_filename is not None:
+            self._recorder = recording.Recorder(self._trace_filename, self._get_trace_header(planner), planner.map.grid)
+
+        if self._headless: return self._run_headless(planner)
+
         frame_countdown = 0
         prev = time.perf_counter()
 
         while True:
             self._events.process(self)
 
-            if self._now >= self._run_time_ms:
-                if not self._finished: metrics.save()
-                self._finished = True
+            if self._now >= self._run_time_ms: self._finish()
 
             if not self._paused and not self._finished:
                 self._step(planner)
@@ -246,7 +356,7 @@ class Simulation:
 
             # Visualize
             if frame_countdown <= 0:
-                self._camera.render(
+                changed_rects = self._camera.render(
                     planner,
                     self._carrier,
                     self._huskies,
@@ -254,6 +364,17 @@ class Simulation:
                     self._paused,
                     self._now
                 )
+                pygame.display.update(changed_rects)
                 frame_countdown = 50
 
-            pygame.display.flip()
+    def _run_headless(self, planner):
+        start = time.perf_counter()
+
+        while self._now < self._run_time_ms:
+            self._step(planner)
+
+        self._finish()
+
+        summary = metrics.summarize(self._now)
+        summary["wall_time_s"] = time.perf_counter() - start
+        return summary
@@ -0,0 +1,67 @@
+import math
+
+class SpatialHash:
+    """
+    Stationary entities by id, like a dict, also bucketed on a uniform grid of their positions so the ones in a region
+    can be found without testing every entity.
+    """
+    def __init__(self, bucket_size):
+        self.bucket_size = bucket_size
+
+        self._entities = {}
+        self._ids_by_bucket = {}
+
+    def _get_bucket(self, x, y):
+        return (int(x // self.bucket_size), int(y // self.bucket_size))
+
+    # Region
+    def in_rect(self, left, bottom, right, top):
+        """
+        Every entity in the buckets overlapping the rectangle; callers still test the exact region they need.
+        """
+        first_col, first_row = self._get_bucket(left, bottom)
+        last_col, last_row = self._get_bucket(right, top)
+
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                for id in self._ids_by_bucket.get((col, row), ()):
+                    yield self._entities[id]
+
+    def in_sector(self, origin, radius, heading, arc):
+        """
+        Every entity in the buckets overlapping the bounds of a circular sector of the given arc, centered on the
+        heading (in degrees) from the origin.
+        """
+        first = heading - arc / 2; last = heading + arc / 2
+
+        # The sector's bounds are set by its center, both ends of its arc, and whichever axes the arc crosses
+        angles = [first, last] + [a for a in range(math.ceil(first / 90) * 90, int(last) + 1, 90)]
+        xs = [origin.x] + [origin.x + radius * math.cos(math.radians(a)) for a in angles]
+        ys = [origin.y] + [origin.y + radius * math.sin(math.radians(a)) for a in angles]
+
+        return self.in_rect(min(xs), min(ys), max(xs), max(ys))
+
+    # Dict Interface
+    def __setitem__(self, id, entity):
+        if id in self._entities: del self[id]
+
+        self._entities[id] = entity
+
+        bucket = self._get_bucket(entity.pose.x, entity.pose.y)
+        try: self._ids_by_bucket[bucket].add(id)
+        except KeyError: self._ids_by_bucket[bucket] = {id}
+
+    def __delitem__(self, id):
+        entity = self._entities.pop(id)
+
+        bucket = self._get_bucket(entity.pose.x, entity.pose.y)
+        self._ids_by_bucket[bucket].remove(id)
+        if len(self._ids_by_bucket[bucket]) == 0: del self._ids_by_bucket[bucket]
+
+    def __getitem__(self, id): return self._entities[id]
+    def __contains__(self, id): return id in self._entities
+    def __len__(self): return len(self._entities)
+    def __iter__(self): return iter(self._entities)
+
+    def items(self): return self._entities.items()
+    def values(self): return self._entities.values()
@@ -0,0 +1,103 @@
+import argparse
+import copy
+import csv
+import debug
+import itertools
+import json
+import multiprocessing
+import os
+import simulation
+import wuc
+
+# Sweep parameters that are not config settings
+ROBOT_COUNT = "robots.count"
+PLANNER_PREFIX = "planner."
+
+def _expand_robot_count(config, count):
+    """
+    The end effector config with robot ids 1 to count dealt out in turn to the end effectors that have robots.
+    """
+    end_effectors = copy.deepcopy(config["robots"]["end_effectors"])
+    in_use = [end_effector for end_effector in end_effectors if len(end_effector["robots"]) > 0] or end_effectors
+
+    for end_effector in end_effectors: end_effector["robots"] = []
+    for id in range(1, count + 1):
+        in_use[(id - 1) % len(in_use)]["robots"].append(id)
+
+    return end_effectors
+
+def _get_runs(sweep, config):
+    """
+    One (config overrides, planner arguments) pair for every combination of the sweep's parameter values.
+    """
+    names = list(sweep["parameters"])
+    runs = []
+
+    for values in itertools.product(*(sweep["parameters"][name] for name in names)):
+        overrides = dict(sweep.get("overrides", {}))
+        planner_args = {}
+
+        for name, value in zip(names, values):
+            if name == ROBOT_COUNT: overrides["robots.end_effectors"] = _expand_robot_count(config, value)
+            elif name.startswith(PLANNER_PREFIX): planner_args[name[len(PLANNER_PREFIX):]] = value
+            else: overrides[name] = value
+
+        runs.append((dict(zip(names, values)), overrides, planner_args))
+
+    return runs
+
+def _run(job):
+    index, config_filename, overrides, planner_args, directory = job
+
+    debug.off()
+
+    wrapper = simulation.Simulation(config_filename, headless = True, overrides = overrides, metrics_directory = directory)
+    planner = wuc.WorkerUnitCoordinator(seed = wrapper.seed, **planner_args)
+
+    return index, wrapper.run(planner)
+
+def main():
+    parser = argparse.ArgumentParser(description = "Run a grid of headless Global Planner scenarios in parallel")
+    parser.add_argument("sweep", help = "JSON file with the base config filename and a list of values per parameter")
+    parser.add_argument("--processes", type = int, default = os.cpu_count())
+    parser.add_argument("--output", default = "data/sweep")
+    args = parser.parse_args()
+
+    with open(args.sweep, "r") as file:
+        sweep = json.load(file)
+
+    config_filename = sweep.get("config", "config.json")
+    with open(config_filename, "r") as file:
+        config = json.load(file)
+
+    runs = _get_runs(sweep, config)
+    jobs = [
+        (i, config_filename, overrides, planner_args, os.path.join(args.output, f"run_{i:04}"))
+        for i, (_, overrides, planner_args) in enumerate(runs)
+    ]
+
+    print(f"Running {len(jobs)} scenarios on {args.processes} processes")
+
+    os.makedirs(args.output, exist_ok = True)
+    parameter_names = list(sweep["parameters"])
+    summary_names = None
+
+    # Rows are appended in the order runs finish, each flushed as it is written so an interrupted sweep keeps them
+    with open(os.path.join(args.output, "results.csv"), "w+", newline = "") as file:
+        writer = csv.writer(file, delimiter = ";")
+
+        with multiprocessing.Pool(args.processes) as pool:
+            for index, summary in pool.imap_unordered(_run, jobs):
+                parameters = runs[index][0]
+                print(f"[{index + 1}/{len(jobs)}] {parameters}: {summary['collected']} collected")
+
+                if summary_names is None:
+                    summary_names = list(summary)
+                    writer.writerow(["run"] + parameter_names + summary_names)
+
+                row = [parameters[name] for name in parameter_names] + [summary[name] for name in summary_names]
+                writer.writerow([index] + row)
+                file.flush()
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import math
+import random
 
 # Tuple Vectors
 def distance(p1, p2):
@@ -8,3 +9,11 @@ def clip(low, value, high):
     if value < low: return low
     if value > high: return high
     return value
+
+# Random
+def create_rng(seed, stream):
+    """
+    An independent random number generator for one part of the system, so the values it draws depend only on the seed
+    and its name, not on how calls to other generators are interleaved or on which process it runs in.
+    """
+    return random.Random(f"{seed}/{stream}")
@@ -1,35 +1,121 @@
+import assignment
+import bisect
+import chunks
+import collections
 import common
 import cmd
 import debug
 import math
-import queue
-import random
+import numpy
+import search
+import sequencing
 import tasks
+import util
 
 class LocationTracker:
+    """
+    Converts locations on the road between the frame of the carrier, which moves along the corridor, and corridor
+    coordinates, which do not. Task locations are kept in corridor coordinates, so as the carrier moves only its offset
+    along the corridor changes, and they are converted to the carrier's frame wherever they are read.
+    """
     def __init__(self):
-        self._poses = []
+        self.offset = 0
 
-    def track(self, pose):
-        self._poses.append(pose)
+    def to_absolute(self, location):
+        return common.Location(location.x, location.y + self.offset)
 
-    def remove(self, pose):
-        self._poses.remove(pose)
+    def to_relative(self, location):
+        return common.Location(location.x, location.y - self.offset)
 
     def update(self, dy):
-        for pose in self._poses:
-            pose.y -= dy
+        self.offset += dy
+
+class RetrievalTaskIndex:
+    """
+    Queued retrieval tasks, bucketed by lane and kept sorted by absolute corridor y within each lane, so the tasks
+    nearest to a position can be found without sorting or scanning the whole queue.
+    """
+    def __init__(self, flow):
+        self._flow = flow
+
+        self._entries_by_lane = {}
+        self._count = 0
+        self._sequence = 0
+
+    def add(self, task):
+        lane = self._flow.get_lane(task.location)
+
+        try: entries = self._entries_by_lane[lane]
+        except KeyError: entries = self._entries_by_lane[lane] = []
+
+        self._sequence += 1
+        bisect.insort(entries, (task.location.y, self._sequence, task))
+        self._count += 1
+
+    def remove(self, task):
+        entries = self._entries_by_lane[self._flow.get_lane(task.location)]
+
+        i = bisect.bisect_left(entries, (task.location.y,))
+        while entries[i][2] is not task: i += 1
+
+        entries.pop(i)
+        self._count -= 1
+
+    def near(self, lane, absolute_y, n, accept):
+        """
+        Up to n accepted tasks in the lane, nearest first to the given corridor y, where travelling backward costs
+        double like in PathPlanner.distance.
+        """
+        entries = self._entries_by_lane.get(lane, [])
+
+        ahead = bisect.bisect_left(entries, (absolute_y,))
+        behind = ahead - 1
+
+        nearest = []
+        while len(nearest) < n and (behind >= 0 or ahead < len(entries)):
+            ahead_dy = entries[ahead][0] - absolute_y if ahead < len(entries) else math.inf
+            behind_dy = 2 * (absolute_y - entries[behind][0]) if behind >= 0 else math.inf
+
+            if ahead_dy <= behind_dy:
+                task = entries[ahead][2]; ahead += 1
+            else:
+                task = entries[behind][2]; behind -= 1
+
+            if accept(task): nearest.append(task)
+
+        return nearest
+
+    def between(self, first_absolute_y, last_absolute_y):
+        """
+        Every task, in any lane, from the first to the last corridor y inclusive.
+        """
+        for entries in self._entries_by_lane.values():
+            first = bisect.bisect_left(entries, (first_absolute_y,))
+            last = bisect.bisect_left(entries, (last_absolute_y, math.inf))
+
+            for _, _, task in entries[first:last]: yield task
+
+    def __len__(self): return self._count
+    def __iter__(self):
+        for entries in self._entries_by_lane.values():
+            for _, _, task in entries: yield task
 
 class CarrierQueue:
-    def __init__(self, map, flow):
+    def __init__(self, map, flow, assignment_engine = "greedy", seed = 0, sequencing_engine = "none", max_assignments_per_robot = 3):
         self.map = map
         self.flow = flow
+        self.assignment = assignment.create(assignment_engine)
+        self.sequencing = sequencing.create(sequencing_engine)
+
+        self._rng = util.create_rng(seed, "allocation")
 
         self.location_tracker = LocationTracker()
-        self.retrieval_task_queue = []
+        self.retrieval_task_queue = RetrievalTaskIndex(flow)
 
         self._known_trash_ids = set()
-        self._max_assignments_per_robot = 3
+        self._unchecked_tasks = []
+        self._max_assignments_per_robot = max_assignments_per_robot
+        self._candidates_per_robot = 8
 
     def _assign_service_tasks(self, robots):
         for id, robot in robots.items():
@@ -42,9 +128,26 @@ class CarrierQueue:
 
                     # If taking a Retrieve task out of assignment, add it to the front of the queue
                     if isinstance(current_active_task, tasks.Retrieve):
-                        self.retrieval_task_queue.insert(0, current_active_task)
+                        self.retrieval_task_queue.add(current_active_task)
+
+                # Service happens at the carrier, so aim for where it is now along the corridor
+                service_task = tasks.Service(robot.charge, robot.bin)
+                service_task.location = self.location_tracker.to_absolute(service_task.location)
+
+                robot.todo.insert(0, service_task)
+
+    def _sequence(self, robot):
+        """
+        Reorder the retrieve tasks the robot has not started, to go through them with the least travel from where it
+        will be once its current task is done.
+        """
+        first = 1 if len(robot.todo) > 0 and robot.todo[0].state != tasks.QUEUED else 0
 
-                robot.todo.insert(0, tasks.Service(robot.charge, robot.bin))
+        queued_tasks = robot.todo[first:]
+        if len(queued_tasks) < 2 or not all(isinstance(task, tasks.Retrieve) for task in queued_tasks): return
+
+        start = robot.todo[0].location if first == 1 else self.location_tracker.to_absolute(robot.pose.location)
+        robot.todo[first:] = self.sequencing.order(self.flow, start, queued_tasks)
 
     # Notify
     def notify_discoveries(self, robot_pose, discoveries):
@@ -56,15 +159,17 @@ class CarrierQueue:
             if id in self._known_trash_ids: continue
             if certainty < 0.3: continue
 
-            location_absolute = robot_pose.get_absolute(location_relative)
-            self.retrieval_task_queue.append(tasks.Retrieve(id, location_absolute, type, volume, end_effectors))
-            self.location_tracker.track(location_absolute)
+            location = self.location_tracker.to_absolute(robot_pose.get_absolute(location_relative))
+            task = tasks.Retrieve(id, location, type, volume, end_effectors)
+
+            self.retrieval_task_queue.add(task)
+            self._unchecked_tasks.append(task)
             self._known_trash_ids.add(id)
 
     @debug.profiled
     def allocate(self, robots):
         robots_list = list(robots.values())
-        random.shuffle(robots_list)
+        self._rng.shuffle(robots_list)
 
         # Clear out exploration tasks; the map has likely updated anyway
         for robot in robots_list:
@@ -73,41 +178,42 @@ class CarrierQueue:
 
         # self._assign_service_tasks(robots)
 
-        remove_indices = []
-
-        self.retrieval_task_queue.sort(key =  lambda t: t.location.y)
-
-        for i in range(len(self.retrieval_task_queue)):
-            task = self.retrieval_task_queue[i]
-
-            candidate_robots = [robot for robot in robots_list if robot.end_effector in task.skills]
-            if len(candidate_robots) == 0:
-                print(f"[ERROR]: {task.type} cannot be retrieved from {task.location} by any robot; requires {task.skills}.")
-                continue
-
-            available_robots = [robot for robot in candidate_robots if len(robot.todo) < self._max_assignments_per_robot]
+        end_effectors = {robot.end_effector for robot in robots_list}
+        for task in self._unchecked_tasks:
+            if end_effectors.isdisjoint(task.skills):
+                debug.error("%s cannot be retrieved from %s by any robot; requires %s.", task.type, task.location, task.skills)
 
-            min_score = 999999
-            closest_robot = None
+        self._unchecked_tasks.clear()
 
-            for match in available_robots:
-                start = match.todo[-1].location if len(match.todo) > 0 else match.pose.location
+        # Only consider the tasks nearest to where each robot's last task leaves it, within its lane
+        candidate_robots_by_task = {}
 
-                distance = self.flow.distance(start, task.location)
-                if distance is None: continue
+        for robot in robots_list:
+            if len(robot.todo) >= self._max_assignments_per_robot: continue
+
+            start = robot.todo[-1].location if len(robot.todo) > 0 else self.location_tracker.to_absolute(robot.pose.location)
+            nearby_tasks = self.retrieval_task_queue.near(
+                self.flow.get_lane(start),
+                start.y,
+                self._candidates_per_robot,
+                lambda t: robot.end_effector in t.skills
+            )
 
-                score = distance + 1000 * len(match.todo)
-                if score < min_score:
-                    min_score = score
-                    closest_robot = match
+            for task in nearby_tasks:
+                try: candidate_robots_by_task[task].append(robot)
+                except KeyError: candidate_robots_by_task[task] = [robot]
 
-            if closest_robot is not None:
-                closest_robot.todo.append(task)
-                remove_indices.append(i)
+        assigned = self.assignment.assign(
+            self.flow,
+            self.location_tracker,
+            candidate_robots_by_task,
+            self._max_assignments_per_robot
+        )
+        for _, task in assigned:
+            self.retrieval_task_queue.remove(task)
 
-        remove_indices.reverse()
-        for i in remove_indices:
-            self.retrieval_task_queue.pop(i)
+        for robot in dict.fromkeys(robot for robot, _ in assigned):
+            self._sequence(robot)
 
         # assign explore task to any robots not already allocated
         assigned_points = set()
@@ -130,17 +236,57 @@ class CarrierQueue:
                     closest_point = center_location
 
             if closest_point is not None:
-                robot.todo.append(tasks.Explore(closest_point))
+                robot.todo.append(tasks.Explore(self.location_tracker.to_absolute(closest_point)))
                 assigned_points.add(closest_point)
 
+class Frontier:
+    """
+    The cells on the unexplored edge of the map, bucketed by row so the furthest row is known without a scan.
+    """
+    def __init__(self):
+        self.max_row = None
+
+        self._cells_by_row = {}
+        self._count = 0
+
+    def add(self, cell):
+        row = cell[0]
+
+        try: bucket = self._cells_by_row[row]
+        except KeyError: bucket = self._cells_by_row[row] = set()
+
+        if cell in bucket: return
+
+        bucket.add(cell)
+        self._count += 1
+
+        if self.max_row is None or row > self.max_row: self.max_row = row
+
+    def evict_below(self, row):
+        explored_rows = [r for r in self._cells_by_row if r < row]
+        for r in explored_rows:
+            self._count -= len(self._cells_by_row.pop(r))
+
+        if self._count == 0: self.max_row = None
+
+    def in_rows(self, first_row, last_row):
+        for row in range(first_row, last_row + 1):
+            yield from self._cells_by_row.get(row, ())
+
+    def __contains__(self, cell): return cell in self._cells_by_row.get(cell[0], ())
+    def __len__(self): return self._count
+    def __iter__(self):
+        for bucket in self._cells_by_row.values():
+            yield from bucket
+
 class Map:
     def __init__(self):
         self.width = 18000
         self.height = 3219000
         self.resolution = 1000
 
-        self.grid = {}
-        self.frontier = set()
+        self.grid = chunks.ChunkedGrid(math.ceil(self.width / self.resolution))
+        self.frontier = Frontier()
 
         self._carrier_y = 0
 
@@ -148,40 +294,24 @@ class Map:
     def notify_movement(self, dy):
         self._carrier_y += dy
 
-    def notify_grid(self, robot_pose, robot_grid):
+    def notify_grid(self, robot_pose, robot_patch):
         pose_row, pose_col = self.get_containing_cell(robot_pose.x, robot_pose.y)
 
-        frontier_candidates = []
-
-        for cell in robot_grid:
-            row, col = cell
-
-            global_cell = (
-                row + pose_row,
-                col + pose_col
-            )
-
-            scores = robot_grid[cell]
-
-            if global_cell not in self.grid:
-                frontier_candidates.append(global_cell)
-                self.grid[global_cell] = scores
+        # Cells beyond the edges of the road cannot be stored, nor traversed, so the merge clips them
+        new_rows, new_cols = self.grid.merge(
+            robot_patch.row + pose_row,
+            robot_patch.col + pose_col,
+            robot_patch.scores
+        )
 
         if len(self.frontier) > 0:
-            frontier_max_row = max(map(lambda c: c[0], self.frontier))
-
-            explored = []
-            for cell in self.frontier:
-                if cell[0] < frontier_max_row:
-                    explored.append(cell)
+            self.frontier.evict_below(self.frontier.max_row)
 
-            for cell in explored: self.frontier.remove(cell)
+        frontier_max_row = self.frontier.max_row if len(self.frontier) > 0 else 0
 
-        frontier_max_row = max(map(lambda c: c[0], self.frontier)) if len(self.frontier) > 0 else 0
-
-        for candidate in frontier_candidates:
-            if candidate[0] > frontier_max_row:
-                self.frontier.add(candidate)
+        beyond_frontier = new_rows > frontier_max_row
+        for candidate in zip(new_rows[beyond_frontier].tolist(), new_cols[beyond_frontier].tolist()):
+            self.frontier.add(candidate)
 
     # Util
     def get_containing_cell(self, x, y):
@@ -207,9 +337,9 @@ class Map:
         neighbors = []
         for r in range(row - 1, row + 2):
             for c in range(col - 1, col + 2):
-                neighbor = (r, c)
+                if not self.grid.is_known(r, c): continue
 
-                if neighbor not in self.grid: continue
+                neighbor = (r, c)
                 if neighbor == cell: continue
 
                 neighbors.append(neighbor)
@@ -232,8 +362,7 @@ class Map:
 
     # Scan
     def all(self):
-        for tup in self.grid.items():
-            yield tup
+        yield from self.grid.items()
 
 class Robot:
     def __init__(self, pose):
@@ -244,22 +373,34 @@ class Robot:
         self.end_effector = None
 
 class PathPlanner:
-    def __init__(self, map):
+    def __init__(self, map, search_engine = "heap", max_cached_paths = 256, lane_count = 1, any_angle = False):
         self.map = map
+        self._search = search.create(search_engine, map)
+        self._any_angle = any_angle
+
+        # Grid paths by (start cell, goal cell), with the revisions of the map blocks they cross when found and the
+        # index of each cell along them. A search is answered by the part of any cached path running through its start
+        # and then its goal, found through the keys of the paths on each cell. This is a heuristic: the part is a valid
+        # path, but not necessarily the one a fresh search would find, since the heap and hpa engines are not optimal
+        self._path_cache = collections.OrderedDict()
+        self._cache_keys_by_cell = collections.defaultdict(set)
+        self._max_cached_paths = max_cached_paths
+
+        # With an incremental search engine, the grid path each key, like a robot id, was last given
+        self._routes = {}
 
-        # lane_cells = 6000
-        # self.lanes = [(start, start + lane_cells) for start in range(0, self.map.width, lane_cells)]
-        self.lanes = [(0, self.map.width)]
+        lane_width = math.ceil(self.map.width / lane_count)
+        self.lanes = [(start, min(start + lane_width, self.map.width)) for start in range(0, self.map.width, lane_width)]
 
-    def _get_lane(self, position):
+    def get_lane(self, position):
         for span in self.lanes:
             if span[0] <= position.x < span[1]: return span
 
         return None
 
     def distance(self, start, goal):
-        start_lane = self._get_lane(start)
-        goal_lane = self._get_lane(goal)
+        start_lane = self.get_lane(start)
+        goal_lane = self.get_lane(goal)
 
         # Robots may not cross lanes, indicated as a null distance
         if start_lane != goal_lane: return None
@@ -268,15 +409,104 @@ class PathPlanner:
         multiplier = 2 if goal.y < start.y else 1
         return multiplier * start.distance(goal)
 
-    def _build_path(self, parents_by_child, goal_spot):
-        grid_path = [goal_spot]; current_spot = goal_spot
+    def distance_matrix(self, starts, goals):
+        """
+        The distance from every start (rows) to every goal (columns), as in PathPlanner.distance, with infinity in place
+        of null distances across lanes.
+        """
+        start_xs = numpy.array([start.x for start in starts], dtype = float)[:, numpy.newaxis]
+        start_ys = numpy.array([start.y for start in starts], dtype = float)[:, numpy.newaxis]
+        goal_xs = numpy.array([goal.x for goal in goals], dtype = float)[numpy.newaxis, :]
+        goal_ys = numpy.array([goal.y for goal in goals], dtype = float)[numpy.newaxis, :]
 
-        while current_spot in parents_by_child:
-            current_spot = parents_by_child[current_spot]
-            grid_path.append(current_spot)
+        distances = numpy.hypot(goal_xs - start_xs, goal_ys - start_ys)
+        distances *= numpy.where(goal_ys < start_ys, 2, 1)
 
-        grid_path.reverse()
+        lane_ids = {lane: i for i, lane in enumerate(self.lanes)}
+        start_lanes = numpy.array([lane_ids.get(self.get_lane(start), -1) for start in starts])
+        goal_lanes = numpy.array([lane_ids.get(self.get_lane(goal), -1) for goal in goals])
 
+        distances[start_lanes[:, numpy.newaxis] != goal_lanes[numpy.newaxis, :]] = numpy.inf
+        return distances
+
+    def _search_cached(self, start_spot, goal_spot):
+        grid = self.map.grid
+
+        for key in list(self._cache_keys_by_cell.get(goal_spot, ())):
+            grid_path, revisions, index_by_cell = self._path_cache[key]
+
+            # Drop the path if new cells have been added to any block it crosses, which may open a shorter route
+            if any(grid.get_revision(block) != revision for block, revision in revisions):
+                self._uncache(key)
+                continue
+
+            start_index = index_by_cell.get(start_spot)
+            goal_index = index_by_cell[goal_spot]
+            if start_index is None or start_index > goal_index: continue
+
+            self._path_cache.move_to_end(key)
+            return list(grid_path[start_index:goal_index + 1])
+
+        grid_path = self._search.search(start_spot, goal_spot)
+        if grid_path is None or self._max_cached_paths <= 0: return grid_path
+
+        key = (start_spot, goal_spot)
+        if key in self._path_cache: self._uncache(key)
+
+        blocks = {grid.get_block(row) for row, _ in grid_path}
+        revisions = tuple((block, grid.get_revision(block)) for block in blocks)
+        index_by_cell = {cell: i for i, cell in enumerate(grid_path)}
+
+        self._path_cache[key] = (tuple(grid_path), revisions, index_by_cell)
+        for cell in index_by_cell: self._cache_keys_by_cell[cell].add(key)
+
+        if len(self._path_cache) > self._max_cached_paths:
+            self._uncache(next(iter(self._path_cache)))
+
+        return grid_path
+
+    def _uncache(self, key):
+        _, _, index_by_cell = self._path_cache.pop(key)
+
+        for cell in index_by_cell:
+            keys = self._cache_keys_by_cell[cell]
+            keys.discard(key)
+            if len(keys) == 0: del self._cache_keys_by_cell[cell]
+
+    def _smooth(self, grid_path):
+        """
+        Any-angle post-smoothing in the manner of Theta*: drop each cell of the grid path that the robot can skip by
+        heading straight for the next one, as long as the straight line crosses only known cells and costs no more than
+        the cells it replaces. Runs of collinear cells always collapse, leaving one waypoint per turn.
+        """
+        costs = [0]
+        for cell, next_cell in zip(grid_path, grid_path[1:]):
+            costs.append(costs[-1] + search.get_path_cost(self.map, [cell, next_cell]))
+
+        def can_skip(first, last):
+            line_cost = search.get_line_cost(self.map, grid_path[first], grid_path[last])
+
+            # Allow for rounding, since a straight run sums the same costs in a different order
+            return line_cost is not None and line_cost <= costs[last] - costs[first] + 1e-6
+
+        smoothed_path = [grid_path[0]]
+        anchor = 0
+        end = len(grid_path) - 1
+
+        while anchor < end:
+            # Most paths across the open corridor straighten out completely, so try for the end first
+            if can_skip(anchor, end): break
+
+            next_anchor = anchor + 1
+            while next_anchor + 1 < end and can_skip(anchor, next_anchor + 1): next_anchor += 1
+
+            smoothed_path.append(grid_path[next_anchor])
+            anchor = next_anchor
+
+        smoothed_path.append(grid_path[-1])
+        return smoothed_path
+
+    def _build_path(self, grid_path):
         previous_waypoint = self.map.get_center_location(*grid_path.pop(0))
 
         waypoint_path = []
@@ -293,25 +523,14 @@ class PathPlanner:
 
         return waypoint_path
 
-    def _get_traversal_cost(self, current_spot, neighbor_spot):
-        scores = self.map.grid[current_spot]
-
-        dr = neighbor_spot[0] - current_spot[0]
-        dc = neighbor_spot[1] - current_spot[1]
-
-        total = abs(dr + dc)
-
-        if total == 0: return math.copysign(scores[3], dr)
-        if total == 2: return math.copysign(scores[1], dr)
-
-        if dc == 0: return math.copysign(scores[2], dr)
-        elif dr == 0: return math.copysign(scores[0], dc)
-
     @debug.profiled
-    def plan(self, start_pose, goal_pose):
+    def plan(self, start_pose, goal_pose, key = None):
+        """
+        Waypoints from the start pose to the goal pose, or None if there is no path. With an incremental search engine,
+        the key, like a robot id, keeps the search so the route can be repaired as the map changes.
+        """
         start_spot = self.map.get_containing_cell(start_pose.x, start_pose.y)
         goal_spot = self.map.get_containing_cell(goal_pose.x, goal_pose.y)
-        goal_center = self.map.get_center_location(*goal_spot)
 
         if start_spot == goal_spot:
             angle = math.degrees(
@@ -322,82 +541,88 @@ class PathPlanner:
             )
             return [start_pose, common.Pose(goal_pose.x, goal_pose.y, angle)]
 
-        count = 0
-        open_queue = queue.PriorityQueue()
+        if key is not None and self._search.is_incremental:
+            grid_path = self._search.search(start_spot, goal_spot, key)
+            self._routes[key] = tuple(grid_path) if grid_path is not None else None
 
-        open_queue.put((0, count, start_spot))
-        parents_by_child = {}
+        else: grid_path = self._search_cached(start_spot, goal_spot)
 
-        g_score = dict()
-        g_score[start_spot] = 0
+        if grid_path is None: return None
+        return self._get_waypoints(start_pose, goal_pose, grid_path)
 
-        f_score = dict()
-        f_score[start_spot] = goal_center.distance(self.map.get_center_location(*start_spot))
-
-        open_set = {start_spot}
-
-        while not open_queue.empty():
-            f, c, current_spot = open_queue.get()
-            open_set.remove(current_spot)
-
-            if current_spot == goal_spot:
-                path = self._build_path(parents_by_child, goal_spot)
-
-                # Add the initial movement from the start pose to the SECOND grid cell center in the path
-                initial_heading = math.degrees(
-                    math.atan2(
-                        path[0].y - start_pose.y,
-                        path[0].x - start_pose.x
-                    )
-                )
-                path[0].a = initial_heading
-                path.insert(0, start_pose)
-
-                # Remove the final grid cell center and replace it with the goal pose
-                path.pop()
-                final_heading = math.degrees(
-                    math.atan2(
-                        goal_pose.y - path[-1].y,
-                        goal_pose.x - path[-1].x
-                    )
-                )
-                path.append(common.Pose(goal_pose.x, goal_pose.y, final_heading))
+    @debug.profiled
+    def repair(self, key, start_pose, goal_pose):
+        """
+        With an incremental search engine, search again for the route planned for the key, from a start pose along it,
+        now that the map may have changed. Returns the new waypoints if the search found a path cheaper than the rest of
+        the route, otherwise None to keep following the route.
+        """
+        route = self._routes.get(key)
+        if route is None or not self._search.is_incremental: return None
 
-                return path
+        start_spot = self.map.get_containing_cell(start_pose.x, start_pose.y)
+        goal_spot = self.map.get_containing_cell(goal_pose.x, goal_pose.y)
 
+        if start_spot == goal_spot or start_spot not in route or route[-1] != goal_spot: return None
 
-            for neighbor_spot in self.map.get_all_neighbors(current_spot):
-                traversal_cost = self._get_traversal_cost(current_spot, neighbor_spot)
+        grid_path = self._search.search(start_spot, goal_spot, key)
+        if grid_path is None: return None
 
-                temp_g_score = g_score[current_spot] + traversal_cost
+        # Known cells never change, so the rest of the route is still open; only switch for a strictly cheaper path
+        remaining_route = route[route.index(start_spot):]
+        if search.get_path_cost(self.map, grid_path) >= search.get_path_cost(self.map, remaining_route): return None
 
-                if neighbor_spot not in g_score or temp_g_score < g_score[neighbor_spot]:
-                    if current_spot in parents_by_child and parents_by_child[current_spot] == neighbor_spot: continue
+        self._routes[key] = tuple(grid_path)
+        return self._get_waypoints(start_pose, goal_pose, grid_path)
 
-                    parents_by_child[neighbor_spot] = current_spot
-                    g_score[neighbor_spot] = temp_g_score
+    def _get_waypoints(self, start_pose, goal_pose, grid_path):
+        if self._any_angle: grid_path = self._smooth(grid_path)
 
-                    h_score = goal_center.distance(self.map.get_center_location(*neighbor_spot))
-                    f_score[neighbor_spot] = temp_g_score + h_score
+        path = self._build_path(list(grid_path))
 
-                    if neighbor_spot not in open_set:
-                        count += 1
-                        open_queue.put(
-                            (
-                                f_score[neighbor_spot],
-                                count,
-                                neighbor_spot
-                            )
-                        )
-                        open_set.add(neighbor_spot)
+        # Add the initial movement from the start pose to the SECOND grid cell center in the path
+        initial_heading = math.degrees(
+            math.atan2(
+                path[0].y - start_pose.y,
+                path[0].x - start_pose.x
+            )
+        )
+        path[0].a = initial_heading
+        path.insert(0, start_pose)
+
+        # Remove the final grid cell center and replace it with the goal pose
+        path.pop()
+        final_heading = math.degrees(
+            math.atan2(
+                goal_pose.y - path[-1].y,
+                goal_pose.x - path[-1].x
+            )
+        )
+        path.append(common.Pose(goal_pose.x, goal_pose.y, final_heading))
 
-        return None
+        return path
 
 class WorkerUnitCoordinator:
-    def __init__(self):
+    def __init__(
+        self,
+        search_engine = "heap",
+        assignment_engine = "greedy",
+        sequencing_engine = "none",
+        max_assignments_per_robot = 3,
+        lane_count = 1,
+        any_angle = False,
+        seed = 0
+    ):
         self.map = Map()
-        self.flow = PathPlanner(self.map)
-        self.tasks = CarrierQueue(self.map, self.flow)
+        self.flow = PathPlanner(self.map, search_engine, lane_count = lane_count, any_angle = any_angle)
+        self.tasks = CarrierQueue(
+            self.map,
+            self.flow,
+            assignment_engine,
+            seed,
+            sequencing_engine = sequencing_engine,
+            max_assignments_per_robot = max_assignments_per_robot
+        )
         self.robots = {}
 
         self._carrier_speed = 0
@@ -426,8 +651,7 @@ class WorkerUnitCoordinator:
 
         if ready and len(robot.todo) > 0:
             finished_task = robot.todo.pop(0)
-            self.tasks.location_tracker.remove(finished_task.location)
-            debug.log(f"{id} finished task {finished_task}")
+            debug.log("%s finished task %s", id, finished_task)
 
     # Run
     def get(self):
@@ -437,47 +661,64 @@ class WorkerUnitCoordinator:
         self.tasks.allocate(self.robots)
 
         for id, robot in self.robots.items():
-            debug.log(f"{id} pose: {robot.pose}, bin: {robot.bin}%, charge: {robot.charge}%")
-            debug.log(f"{id} tasks: {robot.todo}")
+            debug.log("%s pose: %s, bin: %s%%, charge: %s%%", id, robot.pose, robot.bin, robot.charge)
+            debug.log("%s tasks: %s", id, robot.todo)
 
             if len(robot.todo) > 0 and robot.todo[0].state == tasks.QUEUED:
                 next_task = robot.todo[0]
-                debug.log(f"{id} starting task {next_task}")
+                debug.log("%s starting task %s", id, next_task)
 
-                waypoints = self.flow.plan(robot.pose, next_task.location)
-                debug.log(f"{id} waypoints {waypoints}")
+                goal = self.tasks.location_tracker.to_relative(next_task.location)
+                waypoints = self.flow.plan(robot.pose, goal, key = id)
+                debug.log("%s waypoints %s", id, waypoints)
 
                 if waypoints is None:
-                    print(f"[ERROR]: No path found for {id} from {robot.pose} to {next_task.location}!")
+                    debug.error("No path found for %s from %s to %s!", id, robot.pose, goal)
                     continue
 
-                commands = []
-                previous_pose = waypoints.pop(0)
+                commands = self._get_commands(waypoints, next_task)
 
-                for waypoint_absolute in waypoints:
-                    waypoint_relative = waypoint_absolute.relative_to(previous_pose)
+                debug.log("%s commands %s", id, commands)
+                next_task.state = tasks.ACTIVE
+                plan[id] = commands
 
-                    if waypoint_relative.x != 0 or waypoint_relative.y != 0:
-                        commands.append(cmd.Command("Move", (waypoint_relative.x, waypoint_relative.y)))
+            elif len(robot.todo) > 0 and robot.todo[0].state == tasks.ACTIVE:
+                active_task = robot.todo[0]
 
-                    elif waypoint_relative.a != 0:
-                        commands.append(cmd.Command("Rotate", waypoint_relative.a))
+                # Cells explored since the route was planned may open a cheaper way to the task
+                goal = self.tasks.location_tracker.to_relative(active_task.location)
+                waypoints = self.flow.repair(id, robot.pose, goal)
+                if waypoints is None: continue
 
-                    previous_pose = waypoint_absolute
+                debug.log("%s repaired route to task %s: %s", id, active_task, waypoints)
+                plan[id] = self._get_commands(waypoints, active_task)
 
-                if isinstance(next_task, tasks.Retrieve):
-                    commands.append(cmd.Command("Pick", (next_task.id, next_task.volume)))
+        return plan
 
-                # elif isinstance(next_task, tasks.Service):
-                #     # TODO: These are different than the threshold values because it's opportunistic, verify these
-                #     if robot.charge <= 50:
-                #         commands.append(cmd.Command("Charge", None))
-                #
-                #     if robot.bin >= 75:
-                #         commands.append(cmd.Command("Exchange", None))
+    def _get_commands(self, waypoints, task):
+        commands = []
+        previous_pose = waypoints.pop(0)
 
-                debug.log(f"{id} commands {commands}")
-                next_task.state = tasks.ACTIVE
-                plan[id] = commands
+        for waypoint_absolute in waypoints:
+            waypoint_relative = waypoint_absolute.relative_to(previous_pose)
 
-        return plan
+            if waypoint_relative.x != 0 or waypoint_relative.y != 0:
+                commands.append(cmd.Command("Move", (waypoint_relative.x, waypoint_relative.y)))
+
+            elif waypoint_relative.a != 0:
+                commands.append(cmd.Command("Rotate", waypoint_relative.a))
+
+            previous_pose = waypoint_absolute
+
+        if isinstance(task, tasks.Retrieve):
+            commands.append(cmd.Command("Pick", (task.id, task.volume)))
+
+        # elif isinstance(task, tasks.Service):
+        #     # TODO: These are different than the threshold values because it's opportunistic, verify these
+        #     if robot.charge <= 50:
+        #         commands.append(cmd.Command("Charge", None))
+        #
+        #     if robot.bin >= 75:
+        #         commands.append(cmd.Command("Exchange", None))
+
+        return commands